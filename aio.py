@@ -0,0 +1,707 @@
+import asyncio
+import pickle
+import struct
+from collections import deque
+from itertools import count
+from socket import socket, AF_INET, SOCK_STREAM, SO_RCVBUF, SOL_SOCKET, SO_REUSEADDR
+from time import time
+
+from conman.compression import CODECS
+from conman.conman import Conman
+from conman.coordinator import Coordinator
+from conman.exceptions import ConmanError, ConmanKillSig, ConmanIncompleteMessage, ConmanTimeout
+from conman.utils import as_buffers, backoff
+
+"""
+TODO:
+    - Add support for sending batches from the AsyncCoordinator.
+    - Move packing and unpacking of large messages off of the event loop.
+"""
+
+
+def _make_socket():
+    """Creates a non-blocking TCP socket configured in the same way as a ``Conman``.
+
+    Returns
+    -------
+    soc : `socket.socket`
+        The new socket.
+    """
+    soc = socket(AF_INET, SOCK_STREAM)
+    # Increase receive buffer's size to the largest system permitted value, as
+    # is done by ``Conman``. Accepted sockets inherit this from the listener.
+    soc.setsockopt(SOL_SOCKET, SO_RCVBUF, struct.pack('Q', int(1E10)))
+    soc.setblocking(False)
+    return soc
+
+
+class AsyncConman:
+    """An asyncio counterpart to ``Conman`` which sends and receives messages
+    over a pair of asyncio streams. Messages use the same format as ``Conman``
+    so asyncio and blocking coordinators and workers can be freely mixed.
+
+    Parameters
+    ----------
+    reader : `asyncio.StreamReader`
+        Stream from which messages are read.
+    writer : `asyncio.StreamWriter`
+        Stream to which messages are written.
+    handshake : `bool`, optional
+        Indicates if a handshake is to be used to settle on protocol versions.
+        See ``Conman`` for details. [DEFAULT=True]
+
+    Properties
+    ----------
+    PROTO : `dict`
+        Protocol version information, see ``Conman``.
+    codecs : `tuple` [`str`]
+        Names of the compression codecs available to both ends of the connection.
+    job_id : `int`, `None`
+        The job ID carried by the last non-command message received, see ``Conman``.
+    last_heard : `float`, `None`
+        Time at which the last heartbeat was received, see ``Conman``.
+    session : `str`, `None`
+        Session token, see ``Conman``. Sessions are not resumed by asyncio
+        coordinators, thus this is never set.
+    claim : `tuple` [`str`, `int`], `None`
+        Claim to a lost session, see ``Conman``. This is never set.
+    announce : `bool`
+        Whether jobs are to be announced as they are started, see ``Conman``.
+    peer_announce : `bool`
+        The ``announce`` flag sent by the other end during the handshake.
+    started : `int`, `None`
+        ID of the job that the other end last announced it was starting on.
+    _RCVBUF : `int`
+        The size in bytes of the port receive buffer.
+    _SNDBUF : `float`
+        The size in bytes of the receive buffer at the other end of the connection.
+
+    """
+    # The packing, unpacking, command and handshake code of ``Conman`` only make
+    # use of the attributes set below, not of the socket itself, and so they can
+    # be reused as they are.
+    pack = Conman.pack
+    unpack = Conman.unpack
+    _interpret_command = Conman._interpret_command
+    build_handshake = Conman.build_handshake
+    resolve_handshake = Conman.resolve_handshake
+
+    def __init__(self, reader, writer, handshake=True):
+        self.reader = reader
+        self.writer = writer
+        self.handshake = handshake
+
+        self.PROTO = {'PICKLE': 3, 'CONMAN': 5}
+        self.codecs = tuple(CODECS)
+
+        self._RCVBUF = writer.get_extra_info('socket').getsockopt(SOL_SOCKET, SO_RCVBUF)
+        self._SNDBUF = 0.
+
+        self.job_id = -1
+        self.last_heard = None
+        self.session = None
+        self.claim = None
+        self.announce = False
+        self.peer_announce = False
+        self.started = None
+
+        # If handshake is set to false then use the highest pickle protocol
+        if not self.handshake:
+            self.PROTO['PICKLE'] = pickle.HIGHEST_PROTOCOL
+
+    async def send_message(self, message, **kwargs):
+        """Packs up and sends a message to the connected socket.
+
+        Parameters
+        ----------
+        message : `serialisable`
+             Data to be sent
+        **kwargs
+            Keyword arguments for ``Conman.pack``, along with:
+
+            ``packed``:
+                Flag used to indicate that a message has already been packed.
+                [DEFAULT=False]
+
+        Notes
+        -----
+        This waits until the stream's write buffer has drained below its high
+        water mark, so that a slow reader applies backpressure to the sender.
+        """
+        if not kwargs.get('packed', False):
+            message = self.pack(message, **kwargs)
+        # The buffers are handed over together so that the frame can't be
+        # interleaved with any other.
+        self.writer.writelines(as_buffers(message))
+        await self.writer.drain()
+
+    async def await_message(self):
+        """Waits until a message is received, unpacks it & returns its content.
+
+        Returns
+        -------
+        message : `serialisable`, `str`, `bytes`
+            Data received from the connected socket.
+
+        Notes
+        -----
+        This will automatically execute any command and control messages
+        encountered. Unlike ``Conman`` the message data is received into a
+        bytes object, thus any out-of-band buffers, e.g. numpy arrays, will be
+        read-only.
+        """
+        try:
+            message_size, = struct.unpack('L', await self.reader.readexactly(8))
+            message_bytes = await self.reader.readexactly(message_size)
+        except asyncio.IncompleteReadError as error:
+            # A kill signal may be sent half way though the sending of another message
+            if error.partial.endswith(b'CONMAN_KILL'):
+                raise ConmanKillSig('A kill signal was received')
+            raise ConmanIncompleteMessage(
+                f'Incomplete message received {len(error.partial)} of'
+                f' {error.expected} bytes received') from None
+
+        # Unpack the message and identify if it is a command message
+        message, command, job_id = self.unpack(memoryview(message_bytes), length_prefix=False)
+
+        # Commands are carried out and then the read is repeated to get a user message
+        if command:
+            self._interpret_command(message, job_id)
+            return await self.await_message()
+
+        self.job_id = job_id
+        return message
+
+    async def perform_handshake(self):
+        """Performs a handshake operation with the connected entity.
+        """
+        await self.send_message(self.build_handshake())
+        self.resolve_handshake(await self.await_message())
+
+    async def kill(self):
+        """Shutdown the connection in a graceful manner.
+        """
+        self.writer.close()
+        # This will fail if the connection has already been reset by the other end.
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+
+
+class AsyncConjour(AsyncConman):
+    """Identical in operation to ``AsyncConman``, but tracks the jobs that have
+    been sent out so that they can be recovered if the worker is lost.
+
+    Parameters
+    ----------
+    max_pending : `int`
+        Maximum number of jobs that may be sent to the worker at once.
+    *args
+        Arguments for ``AsyncConman``.
+    **kwargs
+        Keyword arguments for ``AsyncConman``.
+
+    Properties
+    ----------
+    journal : `dict` [`int`, `serialisable`]
+        The outstanding jobs, keyed by their job IDs.
+    slots : `asyncio.Semaphore`
+        Counts the number of jobs that may still be sent to the worker.
+    tasks : `list` [`asyncio.Task`]
+        The tasks that feed jobs to, and drain results from, the worker.
+
+    """
+    def __init__(self, max_pending, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.journal = {}
+        self.slots = asyncio.Semaphore(max_pending)
+        self.tasks = []
+
+
+class AsyncCoordinator:
+    """An asyncio counterpart to ``Coordinator``, permitting conman to be used
+    from within an asyncio application without blocking its event loop.
+
+    Parameters
+    ----------
+    host : `str`
+        Name or IP address of the device on which to open a socket.
+    port : `int`
+        Port number on which to listen for connections.
+    handshake : `bool`, optional
+        By default version compatibility is ensured through the use of a
+        handshake message. See ``Coordinator`` for details. [DEFAULT=True]
+    **kwargs
+
+        ``max_worker_loss``:
+            Specifies the maximum number of lost workers that will be tolerated
+            before a ConmanMaxWorkerLoss exception is raised (`int`). [DEFAULT=2]
+        ``no_worker_kill``:
+            If True then a ConmanNoWorkersFound exception will be raised if all
+            workers have been lost (`bool`). [DEFAULT=True]
+        ``compress``:
+            Compression policy used to decide whether jobs should be compressed
+            before they are sent out (`CompressionPolicy`, `bool`). [DEFAULT=False]
+        ``buffer_size``:
+            Maximum number of jobs that may be queued or running at any one time
+            (`int`). Once reached, submitting further jobs will wait until some
+            complete. [DEFAULT=1024]
+        ``max_pending``:
+            Maximum number of jobs that may be sent to a single worker at once
+            (`int`). Values above one allow the next job to be in transit while
+            the current one is running. [DEFAULT=2]
+
+    Properties
+    ----------
+    workers : `list` [`AsyncConjour`]
+        The connected workers.
+    _server : `asyncio.Server`
+        Server that accepts incoming worker connections.
+    _jobs : `asyncio.Queue`
+        Queue of (job ID, job) pairs waiting to be sent to a worker.
+    _results : `asyncio.Queue`
+        Queue of results waiting to be collected.
+    _capacity : `asyncio.Semaphore`
+        Counts the number of jobs that may still be submitted before
+        ``buffer_size`` is reached.
+    _mounted : `asyncio.Condition`
+        Notified whenever a worker is mounted.
+    _outstanding : `int`
+        Number of submitted jobs whose results have not yet been placed in
+        ``_results``.
+    _routes : `dict` [`int`, `asyncio.Future`]
+        Maps the IDs of jobs submitted via ``run`` to the futures to which
+        their results are to be passed.
+    _error : `ConmanError`, `None`
+        Error raised by the loss of too many workers, if any.
+    _detached : `dict`
+        Lost workers that may yet reconnect, see ``Coordinator``. Sessions are
+        not resumed by asyncio coordinators, thus this is always empty.
+
+    Notes
+    -----
+    The asyncio primitives are created by ``start`` so that they are bound to
+    the running event loop.
+    """
+    def __init__(self, host, port, handshake=True, **kwargs):
+        self.address = (host, port)
+        self.handshake = handshake
+
+        self.compress = kwargs.get('compress', False)
+        self.buffer_size = kwargs.get('buffer_size', 1024)
+        self.max_pending = kwargs.get('max_pending', 2)
+
+        self.workers = []
+
+        # Worker loss behaviour
+        self.max_worker_loss = kwargs.get('max_worker_loss', 2)
+        self.no_worker_kill = kwargs.get('no_worker_kill', True)
+        self._lost_worker_count = 0
+        # Required by the loss checks, which are shared with ``Coordinator``
+        self._detached = {}
+
+        self._job_ids = count()
+        self._routes = {}
+        self._outstanding = 0
+        self._error = None
+
+        self._server = None
+        self._jobs = None
+        self._results = None
+        self._capacity = None
+        self._mounted = None
+
+    async def start(self):
+        """Starts listening for worker connections.
+        """
+        self._jobs = asyncio.Queue()
+        self._results = asyncio.Queue()
+        self._capacity = asyncio.Semaphore(self.buffer_size)
+        self._mounted = asyncio.Condition()
+
+        soc = _make_socket()
+        # Inform the socket it is okay to reuse a port. Useful when debugging.
+        soc.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        soc.bind(self.address)
+        self._server = await asyncio.start_server(self._add_worker, sock=soc, backlog=4096)
+
+    async def mount(self, await_n=1, timeout=None):
+        """Waits until at least ``await_n`` workers have been mounted. Workers
+        are mounted in the background as they connect, so this is only needed
+        when a minimum number of workers is required before continuing.
+
+        Parameters
+        ----------
+        await_n : `int`, optional
+            Number of workers to wait for. [DEFAULT=1]
+        timeout : `float`, `int`, `None`, optional
+            Upper bound, in seconds, on the time to wait for. If `None` then
+            this waits forever. [DEFAULT=None]
+        """
+        async with self._mounted:
+            try:
+                await asyncio.wait_for(
+                    self._mounted.wait_for(lambda: len(self.workers) >= await_n), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def submit(self, jobs):
+        """Queues up jobs to be farmed out to the workers.
+
+        Parameters
+        ----------
+        jobs : `iterable` [`serialisable`]
+            Jobs to be submitted.
+
+        Notes
+        -----
+        This will wait whenever ``buffer_size`` jobs are already queued or
+        running.
+        """
+        for job in jobs:
+            await self._put(job)
+            self._outstanding += 1
+
+    async def run(self, job):
+        """Submits a single job and waits for its result.
+
+        Parameters
+        ----------
+        job : `serialisable`
+            The job to be run.
+
+        Returns
+        -------
+        result : `serialisable`
+            The job's result.
+
+        Notes
+        -----
+        This allows many concurrent tasks to each await their own results. The
+        results of such jobs are not returned by ``results``.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._put(job, future)
+        return await future
+
+    async def _put(self, job, future=None):
+        """Backend code used by ``submit`` and ``run`` to queue a single job.
+
+        Parameters
+        ----------
+        job : `serialisable`
+            The job to be queued.
+        future : `asyncio.Future`, `None`, optional
+            Future to which the job's result is to be passed. If None then the
+            result is placed in the results queue. [DEFAULT=None]
+        """
+        if self._error is not None:
+            raise self._error
+        # Wait for space
+        await self._capacity.acquire()
+        job_id = next(self._job_ids)
+        if future is not None:
+            self._routes[job_id] = future
+        self._jobs.put_nowait((job_id, job))
+
+    async def results(self, timeout=None):
+        """Yields the results of submitted jobs as they are completed.
+
+        Parameters
+        ----------
+        timeout : `float`, `int`, `None`, optional
+            Upper bound, in seconds, on the time to wait for all results to
+            be returned. If `None` then this waits forever. [DEFAULT=None]
+
+        Yields
+        ------
+        result : `serialisable`
+            Results, in the order in which they were returned by the workers.
+
+        Raises
+        ------
+        ConmanTimeout
+            If results are still outstanding once ``timeout`` has elapsed.
+        """
+        deadline = None if timeout is None else time() + timeout
+        while self._outstanding or not self._results.empty():
+            try:
+                item = await asyncio.wait_for(
+                    self._results.get(), None if deadline is None else max(deadline - time(), 0))
+            except asyncio.TimeoutError:
+                raise ConmanTimeout(f'{self._outstanding} results were not returned'
+                                    f' within {timeout} s') from None
+            # None is placed in the queue when too many workers have been lost
+            if item is None:
+                raise self._error
+            yield item
+
+    async def await_results(self, timeout=None):
+        """Waits for, and returns, the results of all submitted jobs.
+
+        Parameters
+        ----------
+        timeout : `float`, `int`, `None`, optional
+            Upper bound, in seconds, on the time to wait for. [DEFAULT=None]
+
+        Returns
+        -------
+        results : `list` [`serialisable`]
+            Results in the order in which they were returned by the workers.
+        """
+        return [result async for result in self.results(timeout)]
+
+    async def _add_worker(self, reader, writer):
+        """Mounts a newly connected worker, called by the server upon each
+        new connection.
+
+        Parameters
+        ----------
+        reader : `asyncio.StreamReader`
+            Stream from which messages are read.
+        writer : `asyncio.StreamWriter`
+            Stream to which messages are written.
+        """
+        worker = AsyncConjour(self.max_pending, reader, writer, handshake=self.handshake)
+        if self.handshake:
+            await worker.perform_handshake()
+        worker.tasks = [asyncio.create_task(self._feed(worker)),
+                        asyncio.create_task(self._drain(worker))]
+        async with self._mounted:
+            self.workers.append(worker)
+            self._mounted.notify_all()
+
+    async def _feed(self, worker):
+        """Sends queued jobs to a worker whenever it has a free slot.
+
+        Parameters
+        ----------
+        worker : `AsyncConjour`
+            The worker to feed.
+        """
+        try:
+            while True:
+                await worker.slots.acquire()
+                job_id, job = await self._jobs.get()
+                # Journal the job before sending it so that it can be recovered
+                worker.journal[job_id] = job
+                await worker.send_message(job, job_id=job_id, compress=self.compress)
+        except ConnectionError:
+            # Worker loss is dealt with by ``_drain``
+            pass
+
+    async def _drain(self, worker):
+        """Receives results from a worker and passes them on.
+
+        Parameters
+        ----------
+        worker : `AsyncConjour`
+            The worker to drain.
+        """
+        try:
+            while True:
+                result = await worker.await_message()
+                job_id = worker.job_id
+                del worker.journal[job_id]
+                worker.slots.release()
+                self._capacity.release()
+                # Pass the result to its awaiting task or onto the results queue
+                future = self._routes.pop(job_id, None)
+                if future is None:
+                    self._outstanding -= 1
+                    self._results.put_nowait(result)
+                elif not future.done():
+                    future.set_result(result)
+        except (ConmanIncompleteMessage, ConnectionError):
+            await self._purge_lost_worker(worker)
+
+    async def _purge_lost_worker(self, lost_worker):
+        """Removes a lost worker from the workers list, requeues its jobs and
+        shuts it down.
+
+        Parameters
+        ----------
+        lost_worker : `AsyncConjour`
+            The lost worker that is to be purged.
+        """
+        self.workers.remove(lost_worker)
+        # Stop feeding the worker before recovering its jobs
+        lost_worker.tasks[0].cancel()
+        for job_id, job in lost_worker.journal.items():
+            self._jobs.put_nowait((job_id, job))
+        await lost_worker.kill()
+        self._lost_worker_count += 1
+        try:
+            self._check_worker_loss()
+        except ConmanError as error:
+            # Pass the error on to everything waiting on results
+            self._error = error
+            for future in self._routes.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._results.put_nowait(None)
+
+    # Loss limits are the same as for the blocking coordinator
+    _check_worker_loss = Coordinator._check_worker_loss
+
+    async def disconnect(self):
+        """Ensure the connections are terminated gracefully upon exit.
+        """
+        # Stop accepting new workers
+        self._server.close()
+        await self._server.wait_closed()
+        for worker in self.workers:
+            for task in worker.tasks:
+                task.cancel()
+            # Send kill command
+            try:
+                await worker.send_message('CONMAN_KILL', command=True)
+            except ConnectionError:
+                pass
+            await worker.kill()
+        # Cancel any tasks still waiting on results
+        for future in self._routes.values():
+            future.cancel()
+
+    async def __aenter__(self):
+        """Entry function for the asynchronous context manager.
+        """
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_trace):
+        """Exit function for the asynchronous context manager.
+        """
+        await self.disconnect()
+
+
+class AsyncWorker:
+    """An asyncio counterpart to ``Worker``. Jobs are retrieved by iterating
+    over the worker with ``async for``, and the result of each must be sent back
+    with ``reply`` before the next is retrieved.
+
+    Parameters
+    ----------
+    host : `str`
+        Host to connect to.
+    port : `int`
+        Port to establish connection through.
+    handshake : `bool`, optional
+        By default version compatibility is ensured through the use of a
+        handshake message. See ``Worker`` for details. [DEFAULT=True]
+    **kwargs
+
+        ``timeout``:
+            Time in seconds to keep attempting to connect with the superior before
+            raising an error (`float`, `int`). [DEFAULT=60]
+        ``compress``:
+            Compression policy used to decide whether results should be compressed
+            before they are sent back (`CompressionPolicy`, `bool`). [DEFAULT=False]
+
+    """
+    def __init__(self, host, port, handshake=True, **kwargs):
+        self.address = (host, port)
+        self.handshake = handshake
+        self.soc = None
+
+        self.timeout = kwargs.get('timeout', 60)
+        self.compress = kwargs.get('compress', False)
+
+        # Jobs that have been received but not yet handed out, the ID of the
+        # job currently being worked on, and the results gathered so far for
+        # the current batch.
+        self._jobs = deque()
+        self._job_id = None
+        self._batch = None
+
+    async def connect(self):
+        """Connect the worker to its superior, retrying for up to ``timeout``
+        seconds.
+        """
+        loop = asyncio.get_running_loop()
+        t_init = time()
+        delays = backoff()
+        while True:
+            soc = _make_socket()
+            try:
+                await loop.sock_connect(soc, self.address)
+                break
+            except OSError:
+                soc.close()
+                # Give up once the time limit has been reached
+                if time() - t_init > self.timeout:
+                    raise
+            # Wait before retrying, backing off exponentially, see ``Conman.make_connection``
+            await asyncio.sleep(next(delays))
+        self.soc = AsyncConman(*await asyncio.open_connection(sock=soc), handshake=self.handshake)
+        # Offer to announce each job as it is started, see ``Worker``
+        self.soc.announce = True
+        if self.handshake:
+            await self.soc.perform_handshake()
+
+    async def disconnect(self):
+        """Ensure the connection is terminated gracefully upon exit.
+        """
+        await self.soc.kill()
+
+    async def __aenter__(self):
+        """Upon entry a connection will be established to a superior.
+        """
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_trace):
+        """Disconnect from the superior.
+        """
+        await self.disconnect()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Returns the next job, waiting for one to arrive if necessary.
+        Iteration ends when the superior sends a kill signal.
+        """
+        # Fetch a new message once all jobs from the last one have been handed out
+        if not self._jobs:
+            try:
+                message = await self.soc.await_message()
+            except ConmanKillSig:
+                raise StopAsyncIteration
+            # Batches hold a list of (job ID, job) pairs
+            if self.soc.job_id is None:
+                self._jobs.extend(message)
+                self._batch = []
+            else:
+                self._jobs.append((self.soc.job_id, message))
+        self._job_id, job = self._jobs.popleft()
+        if self.soc.peer_announce:
+            try:
+                await self.soc.send_message('CONMAN_START', command=True, job_id=self._job_id)
+            except OSError:
+                # The loss of the connection is dealt with once the result is sent
+                pass
+        return job
+
+    async def reply(self, result):
+        """Sends the result of the current job back to the superior.
+
+        Parameters
+        ----------
+        result : `serialisable`
+            Result of the job that was last handed out.
+
+        Notes
+        -----
+        If the job arrived as part of a batch then its result is held back until
+        all jobs in the batch are done, see ``Worker.reply``.
+        """
+        if self._batch is None:
+            await self.soc.send_message(result, job_id=self._job_id, compress=self.compress)
+        else:
+            self._batch.append((self._job_id, result))
+            if not self._jobs:
+                await self.soc.send_message(self._batch, batch=True, compress=self.compress)
+                self._batch = None
@@ -0,0 +1,84 @@
+"""
+Microbenchmark for the cost of journaling a job in ``Conjour``, i.e. the cost of
+adding a job to the end of the journal when it is sent and removing one from
+the front when its result is received. This is measured for a range of queue
+depths for both the append-only ``PageFile`` journal and the original scheme in
+which the journal was rewritten each time a result was received.
+
+Run as ``python -m conman.benchmarks.journal`` from the directory above conman.
+"""
+import tempfile
+from time import perf_counter
+
+from conman.utils import PageFile, save_to_page, load_from_page
+
+
+def bench_page_file(depth, n, size):
+    """Times the journaling of ``n`` results with the ``PageFile`` journal.
+
+    Parameters
+    ----------
+    depth : `int`
+        Number of jobs queued up in the journal.
+    n : `int`
+        Number of results to time.
+    size : `int`
+        Size in bytes of each job.
+
+    Returns
+    -------
+    time : `float`
+        Average time in seconds taken per result.
+    """
+    journal = PageFile()
+    job = bytes(size)
+    for _ in range(depth):
+        journal.append(job)
+    t = perf_counter()
+    # Receive a result, then send out a new job to keep the queue depth steady
+    for _ in range(n):
+        journal.skip()
+        journal.append(job)
+    t = perf_counter() - t
+    journal.close()
+    return t / n
+
+
+def bench_rewrite(depth, n, size):
+    """Times the journaling of ``n`` results when the journal is rewritten after
+    each result is received, as ``Conjour`` used to do.
+
+    Parameters
+    ----------
+    depth : `int`
+        Number of jobs queued up in the journal.
+    n : `int`
+        Number of results to time.
+    size : `int`
+        Size in bytes of each job.
+
+    Returns
+    -------
+    time : `float`
+        Average time in seconds taken per result.
+    """
+    journal = (tempfile.TemporaryFile(buffering=0), [])
+    job = bytes(size)
+    save_to_page([job] * depth, *journal, as_pickle=False)
+    t = perf_counter()
+    for _ in range(n):
+        save_to_page(load_from_page(*journal, unpickle=False)[1:], *journal, as_pickle=False)
+        save_to_page([job], *journal, as_pickle=False)
+    t = perf_counter() - t
+    journal[0].close()
+    return t / n
+
+
+if __name__ == '__main__':
+    size, n = 4096, 2000
+    print(f'Per result journaling cost for {size} byte jobs (microseconds)')
+    print(f'{"depth":>8}{"page file":>12}{"rewrite":>12}')
+    for depth in [1, 10, 100, 1000, 10000]:
+        new = bench_page_file(depth, n, size) * 1E6
+        old = bench_rewrite(depth, max(n // depth, 20), size) * 1E6
+        print(f'{depth:>8}{new:>12.2f}{old:>12.2f}')
@@ -0,0 +1,96 @@
+"""
+Benchmark for the time taken to bring up a farm of workers, i.e. the time from
+the coordinator being created to ``n`` workers having been mounted. The workers
+are run as threads spread over a number of local processes, which stand in for
+the nodes of a cluster. They are started ahead of the coordinator, as they would
+be at the start of a job, and so must retry their connections until it is up.
+
+Run as ``python -m conman.benchmarks.startup`` from the directory above conman.
+Note that each worker takes up a few file descriptors on the coordinator side,
+thus the open file limit may need to be raised for the larger farms.
+"""
+import os
+from multiprocessing import Process
+from socket import socket
+from threading import Thread
+from time import perf_counter, sleep
+
+from conman.coordinator import Coordinator
+from conman.exceptions import ConmanKillSig
+from conman.worker import Worker
+
+
+def run_worker(port):
+    """Connects a worker to the coordinator and waits to be told to stop.
+
+    Parameters
+    ----------
+    port : `int`
+        Port on which the coordinator listens.
+    """
+    with Worker('127.0.0.1', port) as worker:
+        try:
+            worker(None)
+        except ConmanKillSig:
+            pass
+
+
+def run_node(port, n):
+    """Runs ``n`` workers as threads of a single process.
+
+    Parameters
+    ----------
+    port : `int`
+        Port on which the coordinator listens.
+    n : `int`
+        Number of workers to run.
+    """
+    threads = [Thread(target=run_worker, args=(port,)) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def bench_startup(n, nodes, head_start=1.5):
+    """Times the bring up of ``n`` workers spread over ``nodes`` processes.
+
+    Parameters
+    ----------
+    n : `int`
+        Number of workers.
+    nodes : `int`
+        Number of processes over which the workers are spread.
+    head_start : `float`, optional
+        Time in seconds by which the workers are started ahead of the
+        coordinator. [DEFAULT=1.5]
+
+    Returns
+    -------
+    time : `float`
+        Time in seconds taken to mount all of the workers.
+    """
+    # Find a free port
+    with socket() as soc:
+        soc.bind(('127.0.0.1', 0))
+        port = soc.getsockname()[1]
+    processes = [Process(target=run_node, args=(port, n // nodes + (i < n % nodes)))
+                 for i in range(nodes)]
+    for process in processes:
+        process.start()
+    sleep(head_start)
+    t = perf_counter()
+    with Coordinator('127.0.0.1', port) as coordinator:
+        coordinator.mount(n, timeout=600)
+        t = perf_counter() - t
+    for process in processes:
+        process.join()
+    return t
+
+
+if __name__ == '__main__':
+    nodes = min(os.cpu_count() or 1, 16)
+    print(f'Time to mount n workers spread over {nodes} processes (seconds)')
+    print(f'{"n":>8}{"time":>12}')
+    for n in [10, 100, 500, 1000]:
+        print(f'{n:>8}{bench_startup(n, nodes):>12.3f}')
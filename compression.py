@@ -0,0 +1,164 @@
+import zlib
+
+try:
+    import lz4.block
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+"""
+This contains the codecs that may be used to compress messages and the policy
+used to decide, on a message by message basis, if and how they are compressed.
+"""
+
+
+class Codec:
+    """A compression codec.
+
+    Parameters
+    ----------
+    name : `str`
+        Name by which the codec is identified during the handshake.
+    codec_id : `int`
+        Identifier used in message headers to indicate that the codec was used.
+        Zero is reserved for uncompressed messages.
+    compress : `callable`
+        Function that takes a bytes-like object and returns its compressed form.
+    decompress : `callable`
+        Function that takes a compressed bytes-like object and returns the
+        original data as a `bytearray`.
+    """
+    def __init__(self, name, codec_id, compress, decompress):
+        self.name = name
+        self.codec_id = codec_id
+        self.compress = compress
+        self.decompress = decompress
+
+
+# Registry of codecs, only those whose libraries are available are included.
+# Note that lz4_frame must keep the id of 1 as messages flagged as "compressed"
+# by older versions were compressed with it.
+CODECS = {'zlib': Codec('zlib', 3, lambda data: zlib.compress(data, 1),
+                        lambda data: bytearray(zlib.decompress(data)))}
+if lz4 is not None:
+    CODECS['lz4_frame'] = Codec(
+        'lz4_frame', 1, lambda data: lz4.frame.compress(data, compression_level=1),
+        lambda data: lz4.frame.decompress(data, return_bytearray=True))
+    CODECS['lz4_block'] = Codec(
+        'lz4_block', 2, lz4.block.compress,
+        lambda data: lz4.block.decompress(data, return_bytearray=True))
+
+# Look up table to get codecs from their ids
+CODEC_IDS = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+class CompressionPolicy:
+    """Decides, on a message by message basis, whether a message should be
+    compressed and which codec should be used to do so. Small messages are never
+    compressed, while larger ones are only compressed if a sample of their data
+    shows that it is worth doing so.
+
+    Parameters
+    ----------
+    codecs : `tuple` [`str`], optional
+        Names of the codecs that may be used, in order of preference. The first
+        one that is supported by both ends of the connection is used.
+        [DEFAULT=('lz4_block', 'lz4_frame', 'zlib')]
+    threshold : `int`, optional
+        Size in bytes below which messages are never compressed. [DEFAULT=65536]
+    sample_size : `int`, optional
+        Number of bytes sampled from a message to estimate how compressible it
+        is. [DEFAULT=16384]
+    min_saving : `float`, optional
+        The minimum fractional reduction in the sample's size that must be
+        achieved for the message to be compressed. [DEFAULT=0.1]
+
+    Notes
+    -----
+    The sample is comprised of four evenly spaced chunks taken from across the
+    message so that it is representative of more than just the message's start.
+    """
+    def __init__(self, codecs=('lz4_block', 'lz4_frame', 'zlib'), threshold=2**16,
+                 sample_size=2**14, min_saving=0.1):
+        self.codecs = codecs
+        self.threshold = threshold
+        self.sample_size = sample_size
+        self.min_saving = min_saving
+
+    def select(self, buffers, available):
+        """Selects the codec, if any, with which a message should be compressed.
+
+        Parameters
+        ----------
+        buffers : `list` [`memoryview`]
+            Byte-wise views of the message data.
+        available : `tuple` [`str`]
+            Names of the codecs supported by both ends of the connection.
+
+        Returns
+        -------
+        codec : `Codec`, `None`
+            The codec to use, or None if the message should not be compressed.
+        """
+        size = sum(buffer.nbytes for buffer in buffers)
+        # Small messages are not worth compressing
+        if size < self.threshold:
+            return None
+        # Identify the most preferred codec available to both ends
+        codec = next((CODECS[name] for name in self.codecs if name in available), None)
+        if codec is None:
+            return None
+        # Estimate the compression ratio from a sample of the data
+        sample = self._sample(buffers, size)
+        if len(codec.compress(sample)) > (1 - self.min_saving) * len(sample):
+            return None
+        return codec
+
+    def _sample(self, buffers, size):
+        """Takes a sample of four evenly spaced chunks from the message data.
+
+        Parameters
+        ----------
+        buffers : `list` [`memoryview`]
+            Byte-wise views of the message data.
+        size : `int`
+            Total size of the message data in bytes.
+
+        Returns
+        -------
+        sample : `bytes`
+            The sampled data.
+        """
+        chunk = self.sample_size // 4
+        chunks = []
+        for start in (i * size // 4 for i in range(4)):
+            # Locate the buffer in which the chunk starts
+            for buffer in buffers:
+                if start < buffer.nbytes:
+                    chunks.append(buffer[start:start + chunk])
+                    break
+                start -= buffer.nbytes
+        return b''.join(chunks)
+
+
+def as_policy(compress):
+    """Converts the value of a ``compress`` argument into a compression policy.
+
+    Parameters
+    ----------
+    compress : `bool`, `CompressionPolicy`, `None`
+        True for the default policy, False or None for no compression, or the
+        policy that is to be used.
+
+    Returns
+    -------
+    policy : `CompressionPolicy`, `None`
+        The policy to use, or None if messages are not to be compressed.
+    """
+    if isinstance(compress, CompressionPolicy):
+        return compress
+    return DEFAULT_POLICY if compress else None
+
+
+# The policy used when compression is simply turned on
+DEFAULT_POLICY = CompressionPolicy()
@@ -1,24 +1,36 @@
-import lz4.frame
+import fcntl
+import logging
 import pickle
 import select
 import struct
-import tempfile
+import termios
+from collections import deque
+from itertools import islice
+from secrets import token_hex
 from _socket import dup
-from socket import socket, AF_INET, SOCK_STREAM, SO_RCVBUF, SOL_SOCKET,\
-                   CMSG_SPACE, MSG_PEEK, SO_REUSEADDR
+from socket import socket, AF_INET, SOCK_STREAM, SO_RCVBUF, SO_SNDBUF, SOL_SOCKET,\
+                   CMSG_SPACE, MSG_PEEK, MSG_DONTWAIT, SO_REUSEADDR, SO_KEEPALIVE,\
+                   IPPROTO_TCP, TCP_KEEPIDLE, TCP_KEEPINTVL, TCP_KEEPCNT, TCP_USER_TIMEOUT
 from time import time, sleep
 
+from conman.compression import CODECS, CODEC_IDS, as_policy
 from conman.exceptions import ConmanKillSig, ConmanIncompleteMessage
-from conman.utils import save_to_page, load_from_page
+from conman.utils import PageFile, as_buffers, advance_buffers, backoff, frame_size, IOV_MAX
 
 """
 TODO:
-    - Work on introducing a global packing process to speed up operations.
-    
     - Swap out CONMAN_XXX type variables for integer values with global
         labels.
 """
 
+# Layout of the message header, see ``Conman.pack`` for details
+HEADER = struct.Struct('Lq?B???I')
+# Offset of the message data relative to the end of the Message_size field
+DATA_OFFSET = HEADER.size - 8
+
+logger = logging.getLogger(__name__)
+
+
 class Conman(socket):
     """This is a connection manager that augments TCP based sockets to introduce
     higher-level functionality in the form of on-the-fly datagram construction
@@ -43,10 +55,12 @@ class Conman(socket):
         version is to be used, etc. These should be initialized to the most
         widely adopted versions. Version numbers will be updated to highest
         mutually available values during the handshake operation.
-    _poll : `select.poll`
+    _poll : `select.epoll`, `None`
         Used to identify when readable data is present in the port buffer.
         This is needed as there is no other way to check, and reading when
-        there is no data will cause a block until there is data.
+        there is no data will cause a block until there is data. This is only
+        created when first needed, as most connections on the coordinator side
+        are instead polled via the coordinator's shared poll.
     _RCVBUF : `float`
         The size in bytes of the port receive buffer. Used to identify how
         much information can be received outside of the ``_read_message``
@@ -60,6 +74,37 @@ class Conman(socket):
     _is_server: `bool`
         Used behind the scenes to identity if the conman instance is on the
         server/coordinator (True) side or the client/worker side (False).
+    job_id : `int`, `None`
+        The job ID carried by the last non-command message received. A value
+        of -1 indicates that the message was not associated with a job, and
+        None that it was a batch of (job ID, message) pairs.
+    codecs : `tuple` [`str`]
+        Names of the compression codecs available to both ends of the connection.
+        This is initialised to those available locally and narrowed down during
+        the handshake operation.
+    last_heard : `float`, `None`
+        Time at which the last heartbeat was received from the other end of the
+        connection, or None if none have been received.
+    session : `str`, `None`
+        Token identifying the session to which the connection belongs. This is
+        issued by the server/coordinator side when a connection is accepted and
+        is sent to the other end during the handshake.
+    claim : `tuple` [`str`, `int`], `None`
+        Sent during the handshake by a client/worker that is reconnecting. This
+        gives the token of its lost session and the ID of the job, or of the
+        first job in the batch, that it last received.
+    peer_session : `str`, `None`
+        The ``session`` sent by the other end during the handshake.
+    peer_claim : `tuple` [`str`, `int`], `None`
+        The ``claim`` sent by the other end during the handshake.
+    announce : `bool`
+        Sent during the handshake. On the server/coordinator side this asks the
+        other end to announce each job as it starts on it, and on the client/worker
+        side it indicates that it is able to do so. [DEFAULT=False]
+    peer_announce : `bool`
+        The ``announce`` flag sent by the other end during the handshake.
+    started : `int`, `None`
+        ID of the job that the other end last announced that it was starting on.
 
     """
     def __init__(self, address, *args, **kwargs):
@@ -72,8 +117,9 @@ class Conman(socket):
         self.handshake = kwargs.get('handshake', True)
         self.address = address
 
-        self.PROTO = {'PICKLE': 3, 'CONMAN': 1}
-        self._poll = select.epoll()
+        self.PROTO = {'PICKLE': 3, 'CONMAN': 5}
+        self.codecs = tuple(CODECS)
+        self._poll = None
 
         self._RCVBUF = 0.
         self._SNDBUF = 0.
@@ -82,18 +128,26 @@ class Conman(socket):
 
         self._is_server = False
 
+        self.job_id = -1
+        self.last_heard = None
+
+        self.session = None
+        self.claim = None
+        self.peer_session = None
+        self.peer_claim = None
+
+        self.announce = False
+        self.peer_announce = False
+        self.started = None
+
     def __setup(self):
-        """Finishes up the initialisation process by setting up the poll and
-        assigning the local buffer info.
+        """Finishes up the initialisation process by assigning the local buffer
+        info.
 
         Notes
         -----
         This exists only to move some messy code out of the the __init__ function.
         """
-        # Register this socket with the poll to so that it can be used to check
-        # for the presence of readable data in the socket's port buffer.
-        self._poll.register(self, select.POLLIN)
-
         # Increase receive buffer's size to the largest system permitted value.
         # The system limit is small it's okey to max it out. Note that the size
         # is limited by the network switch, not system memory.
@@ -124,8 +178,13 @@ class Conman(socket):
                 Flag used to indicate that a message has already been packed.
                 [DEFAULT=False]
             ``compress``:
-                Compress message prior to sending. [DEFAULT=True]
-
+                Compression policy, or a bool to turn on the default policy,
+                used to decide whether to compress the message. [DEFAULT=False]
+            ``job_id``:
+                ID of the job with which the message is associated. [DEFAULT=-1]
+            ``batch``:
+                Flag used to indicate that the message is a list of (job ID,
+                message) pairs to be sent as a single batch. [DEFAULT=False]
         Notes
         -----
         Function will continue to block until the entire message has been sent.
@@ -139,7 +198,26 @@ class Conman(socket):
             message = self.pack(message, **kwargs)
 
         # Send the message
-        self.send(message)
+        self._send_frame(message)
+
+    def _send_frame(self, frame):
+        """Sends a packed message, ensuring that the whole thing gets out.
+
+        Parameters
+        ----------
+        frame : `list` [`bytes`], `bytes`
+            A packed message, either as a list of buffers or a single buffer.
+
+        Notes
+        -----
+        The buffers are handed to the kernel together, via ``sendmsg``, rather
+        than being joined up first. This avoids copying the message data just
+        to prepend the header. As ``sendmsg`` may return after a partial write
+        it is called repeatedly until all data has been sent.
+        """
+        buffers = as_buffers(frame)
+        while buffers:
+            advance_buffers(buffers, self.sendmsg(buffers[:IOV_MAX]))
 
     def _read_message(self):
         """Backend code used by ``await_message`` to read and unpack messages.
@@ -153,52 +231,101 @@ class Conman(socket):
         -----
         This will automatically execute any command and control messages encountered.
         """
-        # Get data stream's first 8 bytes to determine message length & ensure
-        # retrieval of the full 8 bytes.
-        size_bytes = self.recv(8)
-        while len(size_bytes) < 8:
-            new_bytes = self.recv(8 - len(size_bytes))
-            if len(new_bytes) == 0:  # <-- Catch for timeout related errors
-                # Likelihood of this being encountered is low
-                raise ConmanIncompleteMessage('Cannot fetch length header\n'
-                                              f'\ttimeout: {self.gettimeout()}\n'
-                                              f'\tblocking: {self.getblocking()}')
-            # Append the newly read bytes
-            size_bytes += new_bytes
-
-        # Convert these bytes, which represent an unsigned long int, into an int
-        message_size, = struct.unpack('L', size_bytes)
-
-        # Read from the socket stream until the full message has been read
-        message_bytes = self.recv(message_size)
-        while len(message_bytes) < message_size:
-            # Read data from the buffer but only for the current message i.e.
-            # don't read too much.
-            new_bytes = self.recv(message_size - len(message_bytes))
-            if len(new_bytes) == 0:
-                # This may happen with small timeouts, or if a kill signal is
-                # sent half way though the sending of another message.
-                if message_bytes.endswith(b'CONMAN_KILL'):
-                    raise ConmanKillSig('A kill signal was received')
-                else:
-                    raise ConmanIncompleteMessage(
-                        f'Incomplete message received{len(message_bytes)} of'
-                        f' {message_size} bytes received')
-            message_bytes += new_bytes
-
-        # Unpack the message and identify if it is a command message
-        message, command = self.unpack(message_bytes, length_prefix=False)
+        # Read and unpack the next message and identify if it is a command message
+        message, command, job_id = self._read_frame()
 
         # If the message is a command
         if command:
             # Then pass the command to the system
-            self._interpret_command(message)
+            self._interpret_command(message, job_id)
             # Then repeat the read operation to get a user message
             message = self._read_message()
+        else:
+            # Record the ID of the job that this message is associated with, or
+            # None if it is a batch of jobs.
+            self.job_id = job_id
 
         # Return the message
         return message
 
+    def read_command(self):
+        """Reads a single command message and carries it out. Unlike
+        ``await_message`` this does not go on to wait for a user message.
+
+        Notes
+        -----
+        This must only be called when the next message is known to be a command,
+        e.g. on the coordinator side where heartbeats can arrive on their own.
+        """
+        message, _, job_id = self._read_frame()
+        self._interpret_command(message, job_id)
+
+    def _read_frame(self):
+        """Reads and unpacks the next message, without acting upon it.
+
+        Returns
+        -------
+        message : `serialisable`, `str`, `bytes`
+            The unpacked message data.
+        command : `bool`
+            A boolean indicating if this is a command message.
+        job_id : `int`, `None`
+            ID of the job that the message is associated with, see ``unpack``.
+        """
+        # Get data stream's first 8 bytes to determine message length & ensure
+        # retrieval of the full 8 bytes.
+        size_bytes = bytearray(8)
+        if self._recv_exactly(memoryview(size_bytes)) < 8:  # <-- Catch for timeout related errors
+            # Likelihood of this being encountered is low
+            raise ConmanIncompleteMessage('Cannot fetch length header\n'
+                                          f'\ttimeout: {self.gettimeout()}\n'
+                                          f'\tblocking: {self.getblocking()}')
+
+        # Convert these bytes, which represent an unsigned long int, into an int
+        message_size, = struct.unpack('L', size_bytes)
+
+        # Allocate a buffer for the full message up front and read directly into
+        # it. This avoids repeatedly copying a growing bytes object as each new
+        # segment arrives.
+        message_bytes = bytearray(message_size)
+        received = self._recv_exactly(memoryview(message_bytes))
+        if received < message_size:
+            # This may happen with small timeouts, or if a kill signal is
+            # sent half way though the sending of another message.
+            if message_bytes[:received].endswith(b'CONMAN_KILL'):
+                raise ConmanKillSig('A kill signal was received')
+            else:
+                raise ConmanIncompleteMessage(
+                    f'Incomplete message received{received} of'
+                    f' {message_size} bytes received')
+
+        # Unpack the message
+        return self.unpack(memoryview(message_bytes), length_prefix=False)
+
+    def _recv_exactly(self, view):
+        """Fills a buffer with data read from the socket.
+
+        Parameters
+        ----------
+        view : `memoryview`
+            Writable view of the buffer to be filled.
+
+        Returns
+        -------
+        n_bytes : `int`
+            Number of bytes read. This will only be less than the buffer's size
+            if the connection was closed before the buffer could be filled.
+        """
+        n_bytes = 0
+        while n_bytes < len(view):
+            # Read data from the buffer but only for the current message i.e.
+            # don't read too much.
+            new_bytes = self.recv_into(view[n_bytes:])
+            if new_bytes == 0:
+                break
+            n_bytes += new_bytes
+        return n_bytes
+
     def await_message(self, **kwargs):
         """Waits until a message is received, unpacks it & returns its content.
 
@@ -247,20 +374,32 @@ class Conman(socket):
                 Flag used to send command and control messages (`bool`).
                 [DEFAULT=False]
             ``compress``:
-                Compress message prior to sending (`bool`). Not that this can
-                can account for more than 99.9% of the time required to pack a
-                message so it is strongly advised not to compress messages
-                unless absolutely necessary.[DEFAULT=False]
+                Compression policy used to decide whether, and how, to compress
+                the message (`CompressionPolicy`). If True is given then the
+                default policy is used. As compression can account for more than
+                99.9% of the time required to pack a message the policy will
+                only compress messages that are large and compressible.
+                [DEFAULT=False]
+            ``job_id``:
+                ID of the job with which the message is associated (`int`). For
+                batches this is the ID of the first job, but is not passed on by
+                ``unpack``. [DEFAULT=-1]
+            ``batch``:
+                Flag used to indicate that the message is a list of (job ID,
+                message) pairs that are to be sent as a single batch (`bool`).
+                [DEFAULT=False]
 
         Returns
         -------
-        packed_message : `bytes'
-            The packed message with header as a bytes object.
+        packed_message : `list` [`bytes`]
+            The packed message as a list holding the header followed by the
+            message data. These are kept as separate buffers so that the message
+            data does not have to be copied just to prepend the header.
 
         Notes
         -----
-        A packed message is a bytes object comprised of a header followed by
-        the message data. The header takes the form:
+        A packed message is comprised of a header followed by the message data.
+        The header takes the form:
 
         .. _table-label:
 
@@ -269,36 +408,65 @@ class Conman(socket):
             +=======+=========+==============+
             | 8     | ULong   | Message_size |
             +-------+---------+--------------+
+            | 8     | Long    | Job_id       |
+            +-------+---------+--------------+
             | 1     | Bool    | Command      |
             +-------+---------+--------------+
-            | 1     | Bool    | Compressed   |
+            | 1     | UChar   | Codec        |
             +-------+---------+--------------+
             | 1     | Bool    | Pickled      |
             +-------+---------+--------------+
             | 1     | Bool    | String       |
             +-------+---------+--------------+
+            | 1     | Bool    | Batch        |
+            +-------+---------+--------------+
+            | 3     | -       | Padding      |
+            +-------+---------+--------------+
+            | 4     | UInt    | Buffers      |
+            +-------+---------+--------------+
             | n     | bytes   | Message_data |
             +-------+---------+--------------+
 
         Where:
             - Message_size: Total length of packed message excluding Message_size.
+            - Job_id: ID of the job that the message is associated with, this
+                is -1 for messages that are not associated with any job.
             - Command: Indicates if the message contents are a command intended
                 for the conman or a message for the user.
-            - Compressed: Indicates if Message_data is compressed.
+            - Codec: ID of the codec used to compress Message_data, 0 if it is
+                not compressed. See ``conman.compression.CODECS``.
             - Pickled: Indicates if Message_data is a pickled object.
             - String: Indicates if the message data is a string (True) or bytes
                 (False) entity, only relevant to non-pickled entities.
+            - Batch: Indicates that the message is a batch of (job ID, message)
+                pairs, in which case Job_id is ignored.
+            - Buffers: Number of out-of-band pickle buffers.
             - Message_data: The message that is to be send.
 
         |
 
+        When pickle protocol 5 or higher is in use, objects which support it,
+        such as numpy arrays, have their data buffers pickled out-of-band. These
+        buffers are then sent straight from the object's memory rather than being
+        copied into the pickle stream. In this case Message_data starts with a
+        table of 8 byte unsigned integers giving the length of the pickle stream
+        and of each buffer, which is then followed by the pickle stream and the
+        buffers. Each buffer is padded so that it starts on an 8 byte boundary.
+        When compressed, the pickle stream and each buffer are compressed
+        separately and the table gives their compressed lengths.
+        As the buffers are not copied, objects should not be modified until their
+        message has been sent.
+
+        |
+
         If the message data is comprised of a single bytearray it will be
         interpreted as a bytes object upon reception.
         """
         # Initialise header values to default / dummy values
         is_string = False
         is_pickled = False
-        compress = kwargs.get('compress', False)
+        policy = as_policy(kwargs.get('compress', False))
+        buffers = []
 
         # Identify message as bytes, string or other: set header values
         # then perform any other instance specific operations as needed.
@@ -311,36 +479,73 @@ class Conman(socket):
             message = message.encode('utf-8')
         else:  # <-- Anything else gets pickled
             is_pickled = True
-            # Pickle the message entity
-            message = pickle.dumps(message, protocol=self.PROTO['PICKLE'])
-
-        # Compress the message unless instructed to do so
-        if compress:
-            message = lz4.frame.compress(message, compression_level=1)
+            # Pickle the message entity. Protocol 5 allows large buffers to be
+            # kept out-of-band.
+            if self.PROTO['PICKLE'] >= 5:
+                message = pickle.dumps(message, protocol=self.PROTO['PICKLE'],
+                                       buffer_callback=buffers.append)
+                buffers = [buffer.raw() for buffer in buffers]
+            else:
+                message = pickle.dumps(message, protocol=self.PROTO['PICKLE'])
+
+        # Let the policy decide if the message is worth compressing and, if so,
+        # with which of the mutually available codecs.
+        codec = policy.select(as_buffers([message, *buffers]), self.codecs) if policy else None
+        if codec:
+            message = codec.compress(message)
+            buffers = [codec.compress(buffer) for buffer in buffers]
+
+        # Lay out the message data, i.e. the message followed by any out-of-band
+        # buffers. Note that the offset is relative to the end of Message_size.
+        segments = [message]
+        offset = DATA_OFFSET + len(message)
+        if buffers:
+            buffers = [memoryview(buffer) for buffer in buffers]
+            # Table of the pickle stream's length followed by each buffer's size
+            table = struct.pack(f'{len(buffers) + 1}Q', len(message),
+                                *(buffer.nbytes for buffer in buffers))
+            segments.insert(0, table)
+            offset += len(table)
+            for buffer in buffers:
+                # Pad out so that each buffer starts on an 8 byte boundary
+                if offset % 8:
+                    segments.append(bytes(-offset % 8))
+                    offset += -offset % 8
+                segments.append(buffer)
+                offset += buffer.nbytes
 
         # Construct the header
-        header = struct.pack('L????',
+        header = HEADER.pack(
                              # Length of message + header (excl. Message_size)
-                             len(message) + 4,
+                             offset,
+                             # ID of the associated job
+                             kwargs.get('job_id', -1),
                              # Command status
                              kwargs.get('command', False),
-                             # Compression status
-                             compress,
+                             # Compression codec
+                             codec.codec_id if codec else 0,
                              # Pickling status
                              kwargs.get('pkld', is_pickled),
                              # String or bytes object (if not pickled)
-                             is_string)
+                             is_string,
+                             # Batch status
+                             kwargs.get('batch', False),
+                             # Number of out-of-band buffers
+                             len(buffers))
 
-        # Pack the message and return it
-        return header + message
+        # Return the header and message data without joining them together
+        return [header, *segments]
 
     def unpack(self, message, length_prefix=True):
         """Unpacks a message to yield its contents.
 
         Parameters
         ----------
-        message : `bytes`
-            A full, packed message in bytes without the first 8 byte length prefix.
+        message : `bytes`, `memoryview`
+            A full, packed message in bytes.
+        length_prefix : `bool`, optional
+            Indicates if the message still carries its 8 byte length prefix, as
+            is the case for journaled messages. [DEFAULT=True]
 
         Returns
         -------
@@ -348,24 +553,53 @@ class Conman(socket):
             The unpacked message data.
         command : `bool`
             A boolean indicating if this is a command message.
+        job_id : `int`, `None`
+            ID of the job that the message is associated with. This will be None
+            for batches, whose message data is a list of (job ID, message) pairs.
         """
-        # The first 4 bits indicate message's command, compression, pickled and
-        # string status. See conman.pack documentation for more info.
-        command, compressed, pickled, string = struct.unpack('????', message[0:4])
-        message = message[4:]
-        # Decompress the message if required
-        if compressed:
-            message = lz4.frame.decompress(message)
+        # Work on a memoryview so that slicing does not copy the message data
+        message = memoryview(message)
+        # Strip off the length prefix if present
+        if length_prefix:
+            message = message[8:]
+        # The first 8 bytes give the job ID, the next 5 indicate message's
+        # command, compression, pickled, string and batch status, and the last 4
+        # give the number of out-of-band buffers. See conman.pack documentation
+        # for more info.
+        job_id, command, codec_id, pickled, string, batch, n_buffers = struct.unpack(
+            HEADER.format[1:], message[0:DATA_OFFSET])
+        # Locate the pickle stream and any out-of-band buffers. The buffers are
+        # left as views of the received data so that they are not copied.
+        buffers = []
+        if n_buffers:
+            length, *sizes = struct.unpack_from(f'{n_buffers + 1}Q', message, DATA_OFFSET)
+            offset = DATA_OFFSET + 8 * (n_buffers + 1)
+            data = message[offset:offset + length]
+            offset += length
+            for size in sizes:
+                offset += -offset % 8
+                buffers.append(message[offset:offset + size])
+                offset += size
+            message = data
+        else:
+            message = message[DATA_OFFSET:]
+        # Decompress the message and any buffers if required
+        if codec_id:
+            codec = CODEC_IDS[codec_id]
+            message = codec.decompress(message)
+            buffers = [codec.decompress(buffer) for buffer in buffers]
         # Unpickle the message if required
         if pickled:
-            message = pickle.loads(message)
+            message = pickle.loads(message, buffers=buffers)
         # If the message is not a pickled object but a string
         elif string:
-            message = message.decode('utf-8')
+            message = str(message, 'utf-8')
         # If not pickled and not a string then leave it as bytes
+        else:
+            message = bytes(message)
 
-        # Return the message and command status
-        return message, command
+        # Return the message, command status and job ID
+        return message, command, None if batch else job_id
 
     # </MESSAGING_CODE>
 
@@ -392,12 +626,18 @@ class Conman(socket):
         # small timeout value: this is done as poll() will internally convert
         # 0 to None.
         timeout = timeout * 1000 if timeout else 1E-5 if timeout == 0 else None
+        # Register this socket with a poll of its own, if not done so already, so
+        # that it can be used to check for the presence of readable data in the
+        # socket's port buffer.
+        if self._poll is None:
+            self._poll = select.epoll()
+            self._poll.register(self, select.POLLIN)
         # When select.poll.poll() ends it returns a list of all registered
         # entities that have readable data. Thus just check if the length of
         # the list is zero or not.
         return len(self._poll.poll(timeout)) != 0
 
-    def _interpret_command(self, command):
+    def _interpret_command(self, command, job_id=-1):
         """Carries out instruction based on the command received
 
         Parameters
@@ -406,11 +646,22 @@ class Conman(socket):
             The command to be carried out this may be of one of the following:
                 - CONMAN_KILL: Indicates that the connection is to be terminated
                     via the use of an exception.
+                - CONMAN_HEARTBEAT: Indicates that the other end is still alive.
+                - CONMAN_START: Indicates that the other end is starting on the
+                    job identified by ``job_id``.
+        job_id : `int`, optional
+            The job ID carried by the command message. [DEFAULT=-1]
         """
         # If the kill command is given
         if command == 'CONMAN_KILL':
             # Raise an exception:
             raise ConmanKillSig('A kill signal was received')
+        # If a heartbeat is received, record when
+        elif command == 'CONMAN_HEARTBEAT':
+            self.last_heard = time()
+        # Record which job the other end is running
+        elif command == 'CONMAN_START':
+            self.started = job_id
         else:
             raise NotImplementedError(f'Cannot interpret command "{command}"')
 
@@ -432,7 +683,14 @@ class Conman(socket):
             # Highest available pickle protocol version
             'PICKLE': pickle.HIGHEST_PROTOCOL,
             # Reception buffer size
-            'BUFSZ': self._RCVBUF
+            'BUFSZ': self._RCVBUF,
+            # Available compression codecs
+            'CODECS': list(CODECS),
+            # Session token and any claim to a lost session
+            'SESSION': self.session,
+            'CLAIM': self.claim,
+            # Whether jobs are to be announced as they are started
+            'ANNOUNCE': self.announce
         }
 
         # Return the handshake data
@@ -459,6 +717,14 @@ class Conman(socket):
         # be sent before the target's port blocks.
         self._SNDBUF = handshake['BUFSZ']
 
+        # Only use compression codecs that both ends have available
+        self.codecs = tuple(name for name in CODECS if name in handshake['CODECS'])
+
+        # Record the session info, which older versions won't have sent
+        self.peer_session = handshake.get('SESSION')
+        self.peer_claim = handshake.get('CLAIM')
+        self.peer_announce = handshake.get('ANNOUNCE', False)
+
     def perform_handshake(self):
         """Performs a handshake operation with the connected entity.
         """
@@ -466,13 +732,84 @@ class Conman(socket):
         self.send_message(self.build_handshake())
         # Wait for the incoming handshake message, and resolve it
         self.resolve_handshake(self.await_message())
+
+    def grant_claim(self, held):
+        """Answers the ``peer_claim`` of a reconnecting client/worker, telling
+        it which of the jobs that it received are still outstanding. These are
+        the jobs whose results it must send again if they did not get through.
+
+        Parameters
+        ----------
+        held : `list` [`int`]
+            IDs of the outstanding jobs, or of the first job in each batch. This
+            is empty if the lost session has already been given up on.
+
+        Notes
+        -----
+        This message is not journaled, even by a ``Conjour``, as no result is
+        sent back for it.
+        """
+        self._send_frame(self.pack(list(held)))
+
+    def begin_handshake(self):
+        """Sends the handshake message without waiting for the incoming one,
+        which is to be resolved by ``conclude_handshake`` once it has arrived.
+
+        Notes
+        -----
+        This message is not journaled, even by a ``Conjour``, as it is not
+        answered by a result.
+        """
+        self._send_frame(self.pack(self.build_handshake()))
+
+    def conclude_handshake(self):
+        """Resolves the incoming handshake message, but only if it has arrived
+        in full. This never blocks.
+
+        Returns
+        -------
+        concluded : `bool`
+            True if the handshake has been resolved.
+        """
+        available = self.recv_queue_size
+        if available < 8:
+            return False
+        message_size, = struct.unpack('L', self.recv(8, MSG_PEEK))
+        if available < 8 + message_size:
+            return False
+        message, _, _ = self._read_frame()
+        self.resolve_handshake(message)
+        return True
     # </HANDSHAKE_CODE>
 
     # <CONNECTION_CODE>
-    def accept_connection(self):
+    def bind_and_listen(self):
+        """Binds the socket and opens it to new connections, if not done so
+        already.
+        """
+        # Unbound sockets will be on port 0.
+        if self.getsockname()[1] == 0:
+            # Inform the socket it is okay to reuse a port. Useful when debugging.
+            self.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+            # Bind the socket to the specified host and port
+            self.bind(self.address)
+            # Listen for connections with a backlog queue large enough for many
+            # workers connecting at once. The system caps this to somaxconn.
+            self.listen(4096)
+            # Set the _is_server status
+            self._is_server = True
+
+    def accept_connection(self, conclude=True):
         """Wait for an incoming connection and return a new conman representing
         the connection. This acts as an interface for the socket.accept function.
 
+        Parameters
+        ----------
+        conclude : `bool`, optional
+            If False, the handshake is only begun, leaving it to be concluded
+            via ``conclude_handshake`` once the incoming handshake message has
+            arrived. [DEFAULT=True]
+
         Returns
         -------
         connection : `conman`
@@ -480,36 +817,50 @@ class Conman(socket):
 
         Notes
         -----
-        This function will block until a connection is established.
+        This function will block until a connection is established, unless
+        this socket has been set to non-blocking mode, in which case a
+        BlockingIOError is raised if there are no pending connections.
+         |
+        Should the connection fail to be set up once accepted, e.g. if the
+        handshake can't be sent, it is closed and logged before the error is
+        raised.
          |
         The socket binding and listening operations are carried out here in an
         effort to hide as much of the boilerplate code as possible. This will
         will induce a small overhead but it is negligible.
         """
         # Bind the socket and open it to new connections if not done so already.
-        # Unbound sockets will be on port 0.
-        if self.getsockname()[1] == 0:
-            # Inform the socket it is okay to reuse a port. Useful when debugging.
-            self.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-            # Bind the socket to the specified host and port
-            self.bind(self.address)
-            # Listen for connections with a backlog queue of up to 1000 connections
-            self.listen(1000)
-            # Set the _is_server status
-            self._is_server = True
+        self.bind_and_listen()
 
         # Accept an incoming connection (wait or one if necessary)
         soc, address = self.accept()
 
-        # Convert socket.socket to a conman instance. As the address family and
-        # connection type are statically defined in conman only socket protocol
-        # and file-number need to be passed.
-        conman_soc = self.__class__(address, proto=soc.proto, fileno=dup(soc.fileno()), handshake=self.handshake)
-
-        # Perform the handshake operation to identify protocol versions, but
-        # only if instructed to do so.
-        if self.handshake:
-            conman_soc.perform_handshake()
+        conman_soc = None
+        try:
+            # Convert socket.socket to a conman instance. As the address family
+            # and connection type are statically defined in conman only socket
+            # protocol and file-number need to be passed.
+            conman_soc = self.__class__(address, proto=soc.proto, fileno=dup(soc.fileno()),
+                                        handshake=self.handshake)
+            soc.close()
+
+            # Perform the handshake operation to identify protocol versions, but
+            # only if instructed to do so. A session token is issued along the way.
+            if self.handshake:
+                conman_soc.session = token_hex(16)
+                conman_soc.announce = self.announce
+                if conclude:
+                    conman_soc.perform_handshake()
+                else:
+                    conman_soc.begin_handshake()
+        except Exception as error:
+            # Don't leak the half built connection
+            soc.close()
+            if conman_soc is not None:
+                conman_soc.kill()
+            logger.warning('Dropped connection from %s:%d as it could not be set up: %r',
+                           *address, error)
+            raise
 
         # Finally return the conman
         return conman_soc
@@ -525,6 +876,13 @@ class Conman(socket):
             If zero is given, then only a single attempt will be made which will
             raise an error on failure. If None is given, this operation blocks
             until a connected is established. [DEFAULT=None]
+
+        Notes
+        -----
+        Failed attempts are retried after a delay that starts small and grows
+        exponentially, with random jitter, see ``conman.utils.backoff``. Thus
+        workers connect promptly once the coordinator is up, but many workers
+        started together don't retry in lockstep.
         """
         # Set the server status
         self._is_server = False
@@ -539,20 +897,70 @@ class Conman(socket):
                 t = float('inf')
             # Mark the time of the first connection attempt
             t_init = time()
+            delays = backoff()
             # Try to connect until success
             while self.connect_ex(self.address) != 0:
                 # or until the time limit 't' is reached
                 if time() - t_init > t:
                     # Make one last attempt before raising an error
                     self.connect(self.address)
-                # Wait for 1 second before retrying
-                sleep(1)
+                # Wait before retrying, backing off exponentially, but never
+                # past the time limit.
+                sleep(min(next(delays), max(t_init + t - time(), 0)))
 
         # Perform the handshake operation to identify protocol version,
         # but only if instructed to do so.
         if self.handshake:
             self.perform_handshake()
 
+    def set_keepalive(self, timeout):
+        """Has the kernel declare the connection to be broken once the other end
+        has been unreachable for around ``timeout`` seconds.
+
+        Parameters
+        ----------
+        timeout : `float`, `int`
+            Time in seconds after which an unresponsive connection is dropped.
+
+        Notes
+        -----
+        TCP keepalive probes are sent once the connection has been idle for half
+        of the timeout, and then three more are sent over the other half. As
+        probes are not sent while data is waiting to be acknowledged, data that
+        goes unacknowledged for the whole timeout also causes the connection to
+        be dropped. Either way any subsequent operation on the socket will fail,
+        and a poll will report it as readable.
+        """
+        self.setsockopt(SOL_SOCKET, SO_KEEPALIVE, 1)
+        self.setsockopt(IPPROTO_TCP, TCP_KEEPIDLE, max(int(timeout / 2), 1))
+        self.setsockopt(IPPROTO_TCP, TCP_KEEPINTVL, max(int(timeout / 6), 1))
+        self.setsockopt(IPPROTO_TCP, TCP_KEEPCNT, 3)
+        # Applies when there is data in flight, which suppresses keepalive probes
+        self.setsockopt(IPPROTO_TCP, TCP_USER_TIMEOUT, int(timeout * 1000))
+
+    @property
+    def send_queue_size(self):
+        """Number of bytes in this socket's send queue which have yet to be
+        acknowledged by the target.
+
+        Returns
+        -------
+        size : `int`
+            The size of the send queue in bytes.
+        """
+        return struct.unpack('i', fcntl.ioctl(self.fileno(), termios.TIOCOUTQ, bytes(4)))[0]
+
+    @property
+    def recv_queue_size(self):
+        """Number of bytes waiting to be read from this socket.
+
+        Returns
+        -------
+        size : `int`
+            The size of the receive queue in bytes.
+        """
+        return struct.unpack('i', fcntl.ioctl(self.fileno(), termios.FIONREAD, bytes(4)))[0]
+
     @property
     def alive(self):
         """Returns True if the connection is still active.
@@ -582,10 +990,38 @@ class Conman(socket):
     def kill(self):
         """Shutdown the socket connection in a graceful manner.
         """
-        # Inform connected socket that no further data will be sent.
-        self.shutdown(2)
-        # Terminate the connection.
+        # Inform connected socket that no further data will be sent. This will
+        # fail if the connection has already been reset by the other end.
+        try:
+            self.shutdown(2)
+        except OSError:
+            pass
+        # Terminate the connection and close its poll, if it has one.
         self.close()
+        if self._poll is not None:
+            self._poll.close()
+
+
+class Packer:
+    """Packs and unpacks messages in exactly the same way as a ``Conman``, but
+    without the socket. Unlike a ``Conman``, a packer can be pickled and thus
+    sent to other processes, allowing messages to be packed in parallel.
+
+    Parameters
+    ----------
+    PROTO : `dict`
+        Protocol version information, see ``Conman``.
+    codecs : `tuple` [`str`]
+        Names of the compression codecs that may be used.
+
+    """
+    # Packing and unpacking only make use of the protocol and codec info
+    pack = Conman.pack
+    unpack = Conman.unpack
+
+    def __init__(self, PROTO, codecs):
+        self.PROTO = dict(PROTO)
+        self.codecs = tuple(codecs)
 
 
 class Conjour(Conman):
@@ -596,13 +1032,49 @@ class Conjour(Conman):
     another worker. Logging also helps to determine how much more information
     can be sent before the send operation becomes blocking.
 
+    Properties
+    ----------
+    idle : `bool`
+        True if the worker has no outstanding jobs.
+    accounting : `str`
+        How ``free_space`` is worked out, either "estimate" to estimate it from
+        the target's reported buffer size and the messages sent to it, or
+        "kernel" to read the state of the send queue from the kernel.
+    data_log : `deque` [`int`]
+        The port buffer space taken up by each outstanding job.
+    _logged : `int`
+        Running total of ``data_log``.
+    journal : `PageFile`
+        Page file holding a copy of each outstanding job, oldest first.
+    sent_log : `deque` [`float`]
+        Time at which each outstanding job was sent.
+    runtime : `float`
+        Time taken to run the last job for which a result was returned, as
+        measured from when it was sent, or from when the previous result was
+        returned if later, i.e. from when the target could have started on it.
+    _last_receipt : `float`
+        Time at which the last result was returned.
+    _outbox : `deque` [`memoryview`]
+        Buffers holding the parts of queued messages that have yet to be sent.
+        Following a partial write the first buffer is replaced by a view of
+        its unsent remainder.
+    _outbox_size : `int`
+        Number of bytes in ``_outbox``.
+
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.idle = True
-        self.data_log = []
-        self.journal = (tempfile.TemporaryFile(buffering=0), [])
+        self.accounting = kwargs.get('accounting', 'estimate')
+        self.data_log = deque()
+        self._logged = 0
+        self.journal = PageFile()
+        self.sent_log = deque()
+        self.runtime = 0.0
+        self._last_receipt = 0.0
+        self._outbox = deque()
+        self._outbox_size = 0
 
     @property
     def free_space(self):
@@ -625,11 +1097,50 @@ class Conjour(Conman):
         first message due to its reactive nature. Such a check is not
         strictly speaking necessary as ``Conjour`` instances are only
         used on the server/coordinator side.
+         |
+        In "kernel" accounting mode the free space is instead taken to be the
+        room left in this socket's send queue, as reported by the kernel. The
+        kernel doubles the requested buffer size to allow for bookkeeping, only
+        half of which is assumed to be available for data. As the send queue
+        only fills up once the target's port buffer is full, this reflects the
+        true state of both buffers, rather than an estimate of them. There is
+        taken to be no free space while queued messages are waiting to be sent,
+        as the kernel has already refused them.
+        """
+        if self.accounting == 'kernel':
+            if self._outbox:
+                return 0
+            return max(self.getsockopt(SOL_SOCKET, SO_SNDBUF) // 2 - self.send_queue_size, 0)
+
+        # Calculate the free space from the running total, excluding the first
+        # message if this is the server/coordinator side of the connection.
+        logged = self._logged
+        if self._is_server and self.data_log:
+            logged -= self.data_log[0]
+        return max(int(self._SNDBUF * 0.95) - logged, 0)
+
+    @property
+    def busy_since(self):
+        """Time at which the target could have started on its current job.
+
+        Returns
+        -------
+        busy_since : `float`
+            The time, as given by ``time.time``, at which the oldest outstanding
+            job was sent, or at which the previous result was returned if later.
         """
-        # Calculate the free space, excluding the first message if this is the
-        # server/coordinator side of the connection.
-        n = 1 - (not self._is_server)  # <-- 0 if server/coordinator, 1 if client/worker
-        return max(int(self._SNDBUF * 0.95) - sum(self.data_log[n:]), 0)
+        return max(self.sent_log[0], self._last_receipt)
+
+    @property
+    def pending_output(self):
+        """Number of bytes of queued messages that have yet to be sent.
+
+        Returns
+        -------
+        size : `int`
+            The number of unsent bytes.
+        """
+        return self._outbox_size
 
     def send_message(self, message, **kwargs):
         """Packs up and sends a message to the connected socket.
@@ -645,16 +1156,27 @@ class Conjour(Conman):
             ``command``:
                 Flag used to send command and control messages. [DEFAULT=False]
             ``compress``:
-                Compress message prior to sending. [DEFAULT=True]
+                Compression policy, or a bool to turn on the default policy,
+                used to decide whether to compress the message. [DEFAULT=False]
             ``packed``:
                 Flag used to indicate that a message has already been packed.
                 [DEFAULT=False]
+            ``job_id``:
+                ID of the job with which the message is associated. [DEFAULT=-1]
+            ``batch``:
+                Flag used to indicate that the message is a list of (job ID,
+                message) pairs to be sent as a single batch. [DEFAULT=False]
+            ``queue``:
+                If True, the message is sent without blocking, with whatever
+                the kernel won't accept being queued up to be sent later by
+                ``flush``. [DEFAULT=False]
 
         Notes
         -----
-        Function will continue to block until the entire message has been sent.
-        Blocking is encountered when the message size exceeds the available free
-        space in the target's port buffer and said buffer is not cleared quickly.
+        Unless queued, this function will continue to block until the entire
+        message, and any queued before it, has been sent. Blocking is encountered
+        when the message size exceeds the available free space in the target's
+        port buffer and said buffer is not cleared quickly.
         """
 
         # Parse the message into a byte-stream and package it into a data-frame,
@@ -662,8 +1184,11 @@ class Conjour(Conman):
         if not kwargs.get('packed', False):
             message = self.pack(message, **kwargs)
 
-        # Send the message
-        self.send(message)
+        # Place the message in the outbox, behind any that are still waiting to
+        # be sent, so that messages can't be interleaved.
+        buffers = as_buffers(message)
+        self._outbox.extend(buffers)
+        self._outbox_size += sum(buffer.nbytes for buffer in buffers)
 
         # Don't log command messages as they are small compared to the safety net
         # added to the buffer's size.
@@ -671,9 +1196,71 @@ class Conjour(Conman):
             # Set idle status to False
             self.idle = False
             # Append the buffer size that this message would take up to the send_log
-            self.data_log.append(CMSG_SPACE(len(message)))
+            size = CMSG_SPACE(frame_size(message))
+            self.data_log.append(size)
+            self._logged += size
+            self.sent_log.append(time())
             # Add the message to the page file
-            save_to_page([message], *self.journal, as_pickle=False)
+            self.journal.append(message)
+
+        # Send the message. This is done after journaling so that the message
+        # can be recovered should the connection turn out to be broken.
+        self.flush(block=not kwargs.get('queue', False))
+
+    def adopt(self, lost, n):
+        """Takes over the outstanding jobs of a lost connection to the same
+        target, following a reconnection.
+
+        Parameters
+        ----------
+        lost : `Conjour`
+            The lost connection, whose journal is closed.
+        n : `int`
+            Number of the oldest outstanding jobs that the target received. Their
+            results are yet to be returned over this connection.
+
+        Returns
+        -------
+        frames : `list` [`memoryview`]
+            The remaining outstanding jobs, which never reached the target, in
+            the order that they were sent.
+        """
+        frames = lost.journal.pop()
+        self.journal.extend(frames[:n])
+        self.data_log.extend(islice(lost.data_log, n))
+        self._logged = sum(self.data_log)
+        self.sent_log.extend(islice(lost.sent_log, n))
+        self.runtime = lost.runtime
+        self._last_receipt = lost._last_receipt
+        self.idle = n == 0
+        lost.journal.close()
+        return frames[n:]
+
+    def flush(self, block=False):
+        """Sends as much of the queued messages as possible.
+
+        Parameters
+        ----------
+        block : `bool`, optional
+            If True, this will block until all queued messages have been sent.
+            Otherwise only what the kernel will accept without blocking is sent.
+            [DEFAULT=False]
+
+        Returns
+        -------
+        flushed : `bool`
+            True if there is nothing left waiting to be sent.
+        """
+        flags = 0 if block else MSG_DONTWAIT
+        outbox = self._outbox
+        while outbox:
+            try:
+                written = self.sendmsg(list(islice(outbox, IOV_MAX)), [], flags)
+            except BlockingIOError:
+                return False
+            self._outbox_size -= written
+            advance_buffers(outbox, written)
+        return True
 
     def await_message(self, **kwargs):
         """Waits until a message is received, unpacks it & returns its content.
@@ -702,14 +1289,18 @@ class Conjour(Conman):
         # As the job associated with this message has been run we know that the
         # outbound message must have been removed from the port buffer. Thus
         # we can remove it from the send_log
-        del self.data_log[0]
-        # Remove the job from the journal and rewrite the page file. The page
-        # file must be rewriten otherwise the file size will grow linearly with
-        # the number of jobs ran.
-        save_to_page(load_from_page(*self.journal, unpickle=False)[1:], *self.journal, as_pickle=False)
-
-        # If the send_log is empty, set status to idle
-        if len(self.journal[1]) == 0:
+        self._logged -= self.data_log.popleft()
+        # Record how long the job took to run, jobs only start once they have
+        # been sent and the job before them has been returned.
+        now = time()
+        self.runtime = now - max(self.sent_log.popleft(), self._last_receipt)
+        self._last_receipt = now
+        # Remove the job from the front of the journal. This does not rewrite
+        # the page file, dead space is instead reclaimed periodically.
+        self.journal.skip()
+
+        # If the journal is empty, set status to idle
+        if len(self.journal) == 0:
             self.idle = True
 
         # Reset blocking status
@@ -723,8 +1314,14 @@ class Conjour(Conman):
         """Shutdown the socket connection in a graceful manner.
         """
         # Close the journal
-        self.journal[0].close()
-        # Inform connected socket that no further data will be sent.
-        self.shutdown(2)
-        # Terminate the connection.
+        self.journal.close()
+        # Inform connected socket that no further data will be sent. This will
+        # fail if the connection has already been reset by the other end.
+        try:
+            self.shutdown(2)
+        except OSError:
+            pass
+        # Terminate the connection and close its poll, if it has one.
         self.close()
+        if self._poll is not None:
+            self._poll.close()
@@ -1,19 +1,24 @@
-import tempfile
-from socket import CMSG_SPACE
-from time import sleep, time
+import logging
+import os
+import pickle
+import select
+from collections import Counter, deque
+from collections.abc import Iterator
+from heapq import heapify, heappop, heappush
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, count, islice
+from socket import CMSG_SPACE, MSG_PEEK, MSG_DONTWAIT
+from time import time
 
-from conman.exceptions import ConmanIncompleteMessage, ConmanMaxWorkerLoss, ConmanNoWorkersFound
-from conman.utils import save_to_page, load_from_page
+from conman.exceptions import ConmanIncompleteMessage, ConmanMaxWorkerLoss, ConmanNoWorkersFound,\
+                             ConmanTimeout, ConmanPoisonedJob
+from conman.utils import PageFile, frame_size
 
-from conman.conman import Conjour
+from conman.conman import Conjour, Packer, HEADER
 
 """
 TODO:
-    - Look at implementing a coordinator poll list and associating the file numbers to
-        enable quick location of returned results.
-    - Add method to deal with the "poisoned job" effect.     
-    - Turn the load_page operation into a generator to prevent loading lots of
-        stuff into memory at once. Especially if it may be immediately placed back.  
     - Abstract type checking to an external wrapper.
     - Add class properties to the class's doc-string.
     - Consider renaming and reworking the "handshake" parameter and improve
@@ -21,11 +26,62 @@ TODO:
     - Add a property that returns the number of running and paged jobs. This will
         require additional internal properties that are updated when a job is
         sent, received, or reallocated.
-    - Change code so that it will only read paged jobs when they can be sent out
-        and that it will not read more paged jobs than it can send. This should
-        help prevent memory issues.
 """
 
+# Placed in a ``map`` call's inbox in place of the result of a quarantined job
+_QUARANTINED = object()
+
+logger = logging.getLogger(__name__)
+
+
+def _pack_batch(packer, compress, batch, join=False):
+    """Packs a batch of jobs into a message.
+
+    Parameters
+    ----------
+    packer : `Conman`, `Packer`
+        The entity that is to pack the message.
+    compress : `CompressionPolicy`, `bool`
+        Compression policy to pack the message with.
+    batch : `list` [`tuple` [`int`, `serialisable`]]
+        The batch of (job ID, job) pairs to pack.
+    join : `bool`, optional
+        If True, the packed message is joined up into a single bytes object.
+        This is required when packing in another process as the out-of-band
+        buffers cannot otherwise be sent back. [DEFAULT=False]
+
+    Returns
+    -------
+    packed_job : `list` [`bytes`], `bytes`
+        The packed message.
+    """
+    # Single jobs are sent as normal messages
+    if len(batch) == 1:
+        job_id, job = batch[0]
+        packed_job = packer.pack(job, job_id=job_id, compress=compress)
+    else:
+        # The first job's ID identifies the batch, see ``_frame_key``
+        packed_job = packer.pack(batch, batch=True, job_id=batch[0][0], compress=compress)
+    return b''.join(packed_job) if join else packed_job
+
+
+def _frame_key(frame):
+    """Reads the ID of the job, or of the first job in the batch, held by a
+    message packed by ``_pack_batch``, without unpacking the message data.
+
+    Parameters
+    ----------
+    frame : `memoryview`, `bytes`
+        The packed message, as stored in a journal.
+
+    Returns
+    -------
+    key : `int`
+        The job ID.
+    """
+    return HEADER.unpack_from(frame)[1]
+
+
 class Coordinator:
     """Manages job distribution and result gathering operations for multiple
     worker connections.
@@ -53,6 +109,68 @@ class Coordinator:
             If no_worker_kill is set to True then a ConmanNoWorkersFound exception
             will be raised if all workers have been lost. Even if that number is
             technically less than the ``max_worker_loss`` value. [DEFAULT=True]
+        ``batch_size``:
+            Default number of jobs to send to a worker in a single message
+            (`int`). [DEFAULT=1]
+        ``compress``:
+            Compression policy used to decide whether jobs should be compressed
+            before they are sent out (`CompressionPolicy`, `bool`). If True then
+            the default policy is used, which only compresses jobs that are large
+            and compressible. [DEFAULT=False]
+        ``packers``:
+            Pool used to pack jobs in parallel when handshake is False
+            (`concurrent.futures.Executor`). A ``ThreadPoolExecutor`` is best
+            suited to jobs whose packing time is dominated by compression, as
+            the compression libraries release the GIL, while a
+            ``ProcessPoolExecutor`` may be used when pickling dominates. Packed
+            jobs are still sent out in order. The pool is not shut down by the
+            coordinator. [DEFAULT=None]
+        ``accounting``:
+            How the free space in each worker's port buffer is worked out
+            (`str`). If "estimate", it is estimated from the buffer size that
+            the worker reported during the handshake and the size of each job
+            that has been sent to it. If "kernel", it is read from the state of
+            the socket's send queue in the kernel, and no more jobs are sent to a
+            worker while the kernel has yet to accept those already sent to it.
+            [DEFAULT="estimate"]
+        ``speculate``:
+            Straggler threshold (`float`, `None`). Once there are no jobs left
+            waiting to be sent, jobs that have been running for more than this
+            many times the average job runtime are copied onto idle workers. The
+            result of whichever copy finishes first is kept and the other is
+            discarded. If None then jobs are never copied. [DEFAULT=None]
+        ``max_attempts``:
+            Number of workers that a job may be running on when they are lost
+            before it is deemed to be "poisoned" and is quarantined rather than
+            being sent out again (`int`, `None`). The jobs in the oldest message
+            held by a lost worker are held to account, unless ``announce`` is
+            set. If None then jobs are always sent out again. [DEFAULT=2]
+        ``announce``:
+            If True, workers are asked to announce each job as they start on it
+            (`bool`). Only the job that a lost worker was running is then held
+            to account, rather than the oldest message that it held, which may
+            have been finished if its results were lost along with the worker.
+            This costs an extra message per job, which is only of note for very
+            short jobs, and requires handshake to be True. [DEFAULT=False]
+        ``keepalive``:
+            Time in seconds after which a worker whose node has crashed or
+            dropped off the network is deemed to have been lost (`float`,
+            `None`). This is detected by the kernel, using TCP keepalive probes
+            and TCP_USER_TIMEOUT. If None then the system defaults are used,
+            which are typically measured in hours. [DEFAULT=None]
+        ``heartbeat``:
+            Interval in seconds at which workers send heartbeats (`float`,
+            `None`), see ``Worker``. Workers that have sent heartbeats but have
+            not done so for three intervals are deemed to have been lost. Unlike
+            ``keepalive`` this also catches hung worker processes, but workers
+            that never send heartbeats are not caught. [DEFAULT=None]
+        ``grace``:
+            Time in seconds for which a lost worker is given to reconnect and
+            resume its session before its jobs are sent out again (`float`,
+            `None`). A worker that reconnects in time keeps the jobs that it
+            received and sends back any results that did not get through, see
+            ``Worker``. Requires handshake to be True. If None then the jobs of
+            lost workers are sent out again straight away. [DEFAULT=None]
 
     Properties
     ----------
@@ -60,39 +178,154 @@ class Coordinator:
         Coordinator socket entity.
     workers : `list` [`Conjour`]
         List to hold the worker socket connections.
-    _job_page : `tuple` [`TemporaryFile`, `list` [`int`]]
-        A temporary file to hold jobs that cannot be submitted yet due to
-        insufficient resource availability and a list of indices specifying
-        the length in bytes of each entry in said file.
-    _res_page : tuple` [`TemporaryFile`, `list` [`int`]]
-        The same as ``_job_page`` but designed to hold results rather than jobs.
+    quarantine : `dict` [`int`, `serialisable`]
+        Jobs that have been quarantined, keyed by job ID.
+    _sources : `deque` [`iterator`]
+        Sources from which jobs, or rather batches of (job ID, job) pairs, are
+        drawn when there is room for them. If handshake is False these yield
+        packed messages instead.
+    _held : `list` [`tuple` [`int`, `serialisable`]], `list` [`bytes`], `None`
+        A batch that has been drawn from ``_sources`` but for which no room
+        could be found. This is always sent before anything else is drawn.
+    _res_page : `PageFile`
+        A page file to hold results that have been received but not yet
+        returned.
     _lost_worker_count : `int`
         A counter for the number of lost workers.
-    _await_time : `float`, `int`
-        Time in seconds to wait between submission attempts. Use will be extended
-        to other functions later.
+    _poll : `select.epoll`
+        A single poll object with which every worker's socket is registered.
+        This allows all workers with readable data to be identified by a single
+        call, rather than polling each worker in turn.
+    _fd_map : `dict` [`int`, `Conjour`]
+        Maps the file number of each worker's socket to the worker itself, so
+        that the events returned by ``_poll`` can be resolved to workers.
+    _job_ids : `itertools.count`
+        Source of the unique IDs with which each submitted job is tagged.
+    _routes : `dict` [`int`, `dict`]
+        Maps the IDs of jobs submitted via ``map`` to the inbox into which
+        their results are to be placed.
+    _idle : `set` [`Conjour`]
+        The workers that are currently idle, updated whenever a worker is sent
+        a job or returns a result.
+    _space_heap : `list` [`tuple` [`int`, `int`, `Conjour`]]
+        Heap of (-free space, entry ID, worker) entries used to find the worker
+        with the most free port buffer space. Entries are added whenever a
+        worker's free space changes, and stale ones are discarded lazily.
+    _heap_entries : `dict` [`Conjour`, `int`]
+        ID of the most recent, and thus only valid, heap entry for each worker.
+    _writers : `set` [`Conjour`]
+        Workers with queued messages waiting to be sent. These are registered
+        with ``_poll`` for writability so that their messages can be sent as
+        and when room becomes available.
+    _runtime_total : `float`
+        Sum of the runtimes of all jobs returned, used to find the average.
+    _runtime_count : `int`
+        Number of jobs whose runtimes make up ``_runtime_total``.
+    _copies : `dict` [`int`, `set` [`Conjour`]]
+        Workers holding each job that has been copied but whose result has yet
+        to be returned, keyed by the ID of the job, or of the first job if it
+        was sent as part of a batch.
+    _leftovers : `dict` [`int`, `set` [`Conjour`]]
+        Workers still running copies of jobs whose results have already been
+        returned, keyed as in ``_copies``. Results of these copies are dropped.
+    _redundant : `dict` [`Conjour`, `int`]
+        Number of leftover copies held by each worker. Workers running nothing
+        but leftover copies are not considered to be active.
+    _attempts : `dict` [`int`, `int`]
+        Number of workers that each job has been running on when they were lost,
+        keyed by job ID. Jobs are only added once they have been implicated in
+        a loss and are removed once their result is returned. As these are kept
+        apart from the jobs themselves they survive the jobs being re-queued,
+        re-packed or split out of their batches.
+    _next_check : `float`
+        Time before which workers are not checked for missed heartbeats again.
+    _detached : `dict` [`str`, `tuple` [`Conjour`, `float`]]
+        Lost workers that may yet reconnect, along with the time at which their
+        jobs are to be given up on, keyed by session token.
+    _greeting : `dict` [`int`, `Conjour`]
+        Newly accepted connections whose handshakes have yet to be concluded,
+        keyed by file number. These are registered with ``_poll`` so that their
+        handshakes can be concluded once the incoming message has arrived.
+    _retiring : `set` [`Conjour`]
+        Workers that are to be sent no more jobs, and are to be disconnected
+        once they have returned the results of those that they hold.
     """
 
     def __init__(self, host, port, handshake=True, **kwargs):
         self.soc = Conjour((host, port), handshake=handshake)
+        # Start listening straight away so that workers can connect at any point
+        self.soc.bind_and_listen()
+        self.soc.setblocking(False)
 
         self.compress = kwargs.get('compress', False)
+        self.batch_size = kwargs.get('batch_size', 1)
+        self.packers = kwargs.get('packers', None)
+        self.accounting = kwargs.get('accounting', 'estimate')
+        if self.accounting not in ('estimate', 'kernel'):
+            raise ValueError('"accounting" must be either "estimate" or "kernel"')
 
         # List to hold worker socket connections
         self.workers = []
 
+        # Shared poll object & file number to worker map for all worker sockets.
+        # The coordinator's own socket is registered to pick up new connections.
+        self._poll = select.epoll()
+        self._fd_map = {}
+        self._poll.register(self.soc, select.EPOLLIN)
+
+        # Connections that are mid-handshake and workers that are to be retired
+        self._greeting = {}
+        self._retiring = set()
+
         self.handshake = handshake
 
+        # Job ID source and result routing table
+        self._job_ids = count()
+        self._routes = {}
+
+        # Idle workers and workers ranked by free space
+        self._idle = set()
+        self._space_heap = []
+        self._heap_entries = {}
+        self._heap_ids = count()
+
+        # Workers with messages waiting to be sent
+        self._writers = set()
+
+        # Straggler mitigation settings, job runtime statistics and copied jobs
+        self.speculate = kwargs.get('speculate', None)
+        self._runtime_total = 0.0
+        self._runtime_count = 0
+        self._copies = {}
+        self._leftovers = {}
+        self._redundant = {}
+
+        # Poisoned job detection
+        self.max_attempts = kwargs.get('max_attempts', 2)
+        self._attempts = {}
+        self.quarantine = {}
+        self.soc.announce = kwargs.get('announce', False)
+
+        # Liveness detection
+        self.keepalive = kwargs.get('keepalive', None)
+        self.heartbeat = kwargs.get('heartbeat', None)
+        self._next_check = 0.0
+
+        # Lost workers that may reconnect
+        self.grace = kwargs.get('grace', None) if handshake else None
+        self._detached = {}
+
         # Worker loss behaviour
         self.max_worker_loss = kwargs.get('max_worker_loss', 2)
         self.no_worker_kill = kwargs.get('no_worker_kill', True)
         self._lost_worker_count = 0
 
-        # Temporary files and journals for paging results and jobs to.
-        self._job_page = (tempfile.TemporaryFile(buffering=0), [])
-        self._res_page = (tempfile.TemporaryFile(buffering=0), [])
+        # Job sources and the next batch of jobs waiting to be sent
+        self._sources = deque()
+        self._held = None
 
-        self._await_time = 0.25
+        # Page file for paging results to.
+        self._res_page = PageFile()
 
     @property
     def active(self):
@@ -104,7 +337,13 @@ class Coordinator:
         activity_status :  `bool`
             True if there are still active jobs or pending results, False if not.
         """
-        return len(self.idle_workers) != len(self.workers) or self._paged_jobs or self._paged_results
+        busy = len(self._idle) != len(self.workers)
+        # Workers only running copies of jobs that have already been returned
+        # don't count.
+        if busy and self._redundant:
+            busy = any(len(worker.data_log) > self._redundant.get(worker, 0)
+                       for worker in self.workers)
+        return busy or self._queued_jobs or self._paged_results or len(self._detached) != 0
 
     @property
     def idle_workers(self):
@@ -115,7 +354,7 @@ class Coordinator:
         idle_workers : `list` [`Conjour`]
             List of workers currently sitting idle
         """
-        return [worker for worker in self.workers if worker.idle]
+        return list(self._idle)
 
     @property
     def _paged_results(self):
@@ -126,22 +365,23 @@ class Coordinator:
         paged_data : `bool`
             Bool indicating the presence of paged results data
         """
-        # If there is paged data, there will be a journal entry. So just check
-        # if the number of journal entries is zero or not.
-        return len(self._res_page[1]) != 0
+        return len(self._res_page) != 0
 
     @property
-    def _paged_jobs(self):
-        """Returns True if there is paged job data.
+    def _queued_jobs(self):
+        """Returns True if there are jobs waiting to be submitted.
 
         Returns
         -------
-        paged_data : `bool`
-            Bool indicating the presence of paged job data
+        queued_jobs : `bool`
+            Bool indicating the presence of jobs waiting to be submitted.
+
+        Notes
+        -----
+        Exhausted job sources are only discarded when they are next drawn from,
+        thus this may give a false positive until then.
         """
-        # If there is paged data, there will be a journal entry. So just check
-        # if the number of journal entries is zero or not.
-        return len(self._job_page[1]) != 0
+        return self._held is not None or len(self._sources) != 0
 
     @property
     def worker_count(self):
@@ -178,101 +418,473 @@ class Coordinator:
         -----
         await_n is just the **minimum** number of workers to await on so it is
         still possible to mount more than ``await_n`` number of workers.
+         |
+        Workers are also mounted in the background, whenever the coordinator
+        waits on its workers, e.g. in ``retrieve`` or ``await_results``. Thus
+        workers may join at any point. Each connection is accepted and its
+        handshake carried out without blocking, as and when the shared poll
+        reports that it can progress. Results returned while mounting are paged.
         """
         # Ensure await_n is not set to zero, as it would cause timeout to be ignored
-        if await_n <= 0:
+        if await_n is not None and await_n <= 0:
             raise ValueError('"await_n" must be None or a none zero positive integer')
 
         # If await_n is specified; keep checking for workers until `timeout` second
         # have elapsed. If timeout is None, then continue checking forever.
-        poll_time_out = timeout if await_n else 0
+        deadline = None if timeout is None else time() + timeout
 
         # If await_n is None: set it to zero to make breaking while loop easy
         await_n = await_n if await_n else 0
 
-        # While there are pending connections
-        while self.soc.poll(poll_time_out):
-            # Accept the next connection & add the worker to the worker list
-            self.workers.append(self.soc.accept_connection())
-            # If no connections in the queue & the specified number of workers
-            # have been mounted.
-            if not self.soc.poll(0) and len(self.workers) >= await_n:
-                # End the mounting process
+        # Progress any pending connections, collecting up anything that the
+        # workers return along the way, until enough workers have been mounted.
+        results = []
+        wait = 0
+        while True:
+            for worker in self._ready_workers(wait):
+                self._drain_worker(worker, results.append)
+            if len(self.workers) >= await_n:
                 break
+            wait = None if deadline is None else deadline - time()
+            if wait is not None and wait <= 0:
+                break
+        self._page_results(results)
 
-    def submit(self, jobs):
+    def submit(self, jobs, batch_size=None):
         """Farms out supplied jobs to free workers.
 
         Parameters
         ----------
-        jobs : `list`, `None`
-            List of jobs to be submitted. None can be supplied in place of a
-            list to force the system to submit only paged jobs.
+        jobs : `iterable` [`serialisable`], `None`
+            Jobs to be submitted. This may be a list or a lazy source, such as
+            a generator, of any length. None can be supplied to force the system
+            to submit only previously queued jobs.
+        batch_size : `int`, `None`, optional
+            Number of jobs to send to a worker in each message. Batching many
+            small jobs together amortises the per-message overhead. If `None`
+            then the coordinator's ``batch_size`` is used. [DEFAULT=None]
+
+        Notes
+        -----
+        Jobs are drawn from ``jobs`` only as and when there is room for them in
+        a worker's port buffer. Those for which there is no room yet are drawn
+        during later calls, e.g. as results are collected, so jobs are never
+        read, pickled or paged ahead of demand. Containers that could be
+        modified in the meantime, such as lists, are copied first, thus only
+        iterators, e.g. generators, and immutable sequences are drawn from
+        lazily.
         """
-        if type(jobs) != list:
-            # Check for special None exception
-            if jobs is None:
-                # Create blank list to append paged jobs to
-                jobs = []
-            else:
-                raise TypeError('Jobs must be supplied in a list')
+        if jobs is None:
+            jobs = []
+        elif isinstance(jobs, (str, bytes, bytearray)):
+            raise TypeError('Jobs must be supplied in an iterable, such as a list')
+        elif not isinstance(jobs, (Iterator, range, tuple)):
+            jobs = list(jobs)
+        # Tag each job with a unique ID, as it is drawn, and submit it
+        job_ids = self._job_ids
+        self._submit(((next(job_ids), job) for job in jobs), batch_size)
+
+    def _submit(self, jobs, batch_size=None):
+        """Backend code used by ``submit`` to farm out jobs that have already
+        been assigned IDs.
+
+        Parameters
+        ----------
+        jobs : `iterable` [`tuple` [`int`, `serialisable`]]
+            Source of (job ID, job) pairs to be submitted.
+        batch_size : `int`, `None`, optional
+            Number of jobs to send in each message. If `None` then the
+            coordinator's ``batch_size`` is used. [DEFAULT=None]
+
+        Notes
+        -----
+        Jobs are grouped into batches, i.e. lists of (job ID, job) pairs, which
+        are then dealt with as single units. A batch of one is sent as a normal
+        job message. The batches are added to the back of the job sources and
+        drawn upon as room becomes available.
+        """
+        jobs = iter(jobs)
+        batch_size = batch_size or self.batch_size
+        batches = iter(lambda: list(islice(jobs, batch_size)), [])
         # If self.handshake = False: All jobs will be packed in the same way,
-        # thus pack all jobs ahead of time to speed things up. Note that it
-        # does not matter which worker does the packing as they will all do it
-        # the same way.
+        # thus pack jobs as they are drawn, irrespective of which worker they
+        # will be sent to.
         if not self.handshake:
-            jobs = [self.workers[0].pack(job, compress=self.compress) for job in jobs]
-        else:
-            # Otherwise; clone the jobs list so the original is not modified
-            jobs = jobs.copy()
+            if self.packers is None:
+                batches = (self._pack_job(self.workers[0], batch) for batch in batches)
+            else:
+                batches = self._pool_pack(batches)
+        self._sources.append(batches)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Sends out queued jobs for as long as there is room for them.
+
+        Notes
+        -----
+        Idle workers are always given a job, regardless of its size, as they are
+        guaranteed to consume it. Otherwise jobs are sent to the worker with the
+        most free space in its port buffer, but only if they fit. Upon
+        encountering a job that does not fit, it is held back and dispatching
+        stops until more room is made.
+         |
+        Jobs are never sent in a blocking manner. Whatever the kernel will not
+        accept straight away is left in the worker's outbox and is sent once
+        the shared poll reports that the worker's socket is writable. Thus one
+        slow worker cannot hold up the rest.
+        """
         # In an effort to free up workers prior to job submission an attempt is
         # made to pre-fetch and store pending results
         self.retrieve(to_page=True)
-        # Load any previously paged jobs, don't unpickle if handshake=False
-        if self._paged_jobs:
-            jobs += load_from_page(*self._job_page, unpickle=self.handshake)
-        # While there are idle workers and jobs left to submit
-        while self.idle_workers and jobs:
-            # Loop over any idle workers and pair them with a job
-            for worker, job in zip(self.idle_workers, jobs):
-                # Submit the job to the worker, the job will have been pre-packed
-                # if handshake=False
-                worker.send_message(job, packed=not self.handshake, compress=self.compress)
-                # Remove the job form the job list
-                jobs.remove(job)
-            # repeat the paging process
-            self.retrieve(to_page=True)
-        if jobs:
-            # Create a list workers list ranked by free port buffer space.
-            workers = sorted(self.workers, key=lambda s: -s.free_space)
-            # Loop over all remaining job
-            for job in jobs:
-                # Loop over all workers
-                for worker in workers:
-                    # Pack the job, to calculate its size. It if fits into the
-                    # worker's port buffer then submit it. It will already have
-                    # been packed if handshake=False
-                    if self.handshake:
-                        packed_job = worker.pack(job)
-                    else:
-                        packed_job = job
-                    if CMSG_SPACE(len(packed_job)) < worker.free_space:
-                        # Submitting the packed job as it is more efficient
-                        worker.send_message(packed_job, packed=True)
-                        # Remove the job from the jobs list
-                        jobs.remove(job)
-                        # Move this worker to the back of the workers list
-                        workers = workers[1:] + workers[:1]
-                        # Break the worker loop
-                        break
-        # If there are jobs left that could not be submitted
-        if jobs:
-            # Then page them for submission later on. If handshake=False then
-            # don't pickle as they will have already been pickled.
-            save_to_page(jobs, *self._job_page, as_pickle=self.handshake)
-
-
-    def retrieve(self, to_page=False):
+        while self.workers:
+            # Get the next batch, which will already have been packed if
+            # handshake=False.
+            job = self._next_job()
+            if job is None:
+                break
+            # Pick an idle worker if there is one, otherwise the worker with the
+            # most free port buffer space.
+            worker = next(iter(self._idle), None) or self._roomiest_worker()
+            # All remaining workers may be retiring
+            if worker is None:
+                self._held = job
+                break
+            packed_job = self._pack_job(worker, job) if self.handshake else job
+            # Submit the packed job if there is room for it, otherwise hold it
+            # back until there is.
+            if worker.idle or CMSG_SPACE(frame_size(packed_job)) < worker.free_space:
+                self._send_job(worker, packed_job)
+            else:
+                self._held = job
+                break
+
+    def _send_job(self, worker, packed_job):
+        """Sends a packed job to a worker without blocking. Should the kernel not
+        accept all of it, the worker is registered for writability so that the
+        remainder can be sent later.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker to which the job is to be sent.
+        packed_job : `list` [`bytes`], `bytes`
+            The packed job.
+        """
+        try:
+            worker.send_message(packed_job, packed=True, queue=True)
+        except OSError:
+            # The connection is broken. Collect whatever the worker sent back
+            # before it was lost, so that it is not blamed for jobs that it has
+            # finished, and have it purged. The job will have been journaled and
+            # so will be reassigned.
+            results = []
+            self._drain_worker(worker, results.append)
+            self._page_results(results)
+            if worker in self.workers:
+                self._purge_lost_worker(worker)
+            return
+        if worker.pending_output and worker not in self._writers:
+            self._writers.add(worker)
+            self._poll.modify(worker, select.EPOLLIN | select.EPOLLOUT)
+        self._track(worker)
+
+    def _flush_worker(self, worker):
+        """Sends as much of a worker's queued messages as its socket will take
+        without blocking, and stops watching it for writability once they have
+        all been sent.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            A worker whose socket has been reported as writable.
+
+        Returns
+        -------
+        alive : `bool`
+            False if the connection was found to be broken.
+        """
+        try:
+            flushed = worker.flush()
+        except OSError:
+            return False
+        if flushed:
+            self._writers.discard(worker)
+            self._poll.modify(worker, select.EPOLLIN)
+        self._track(worker)
+        return True
+
+    def _next_job(self):
+        """Draws the next batch of jobs to be sent out.
+
+        Returns
+        -------
+        job : `list` [`tuple` [`int`, `serialisable`]], `list` [`bytes`], `None`
+            The next batch, which will be pre-packed if handshake is False, or
+            None if there are no jobs left.
+        """
+        # Previously held back jobs go first
+        if self._held is not None:
+            job, self._held = self._held, None
+            return job
+        # Then draw from the job sources in the order in which they were added,
+        # discarding them as they are exhausted.
+        while self._sources:
+            try:
+                return next(self._sources[0])
+            except StopIteration:
+                self._sources.popleft()
+        return None
+
+    def _speculate(self):
+        """Copies jobs that have overrun onto idle workers, oldest first.
+
+        Notes
+        -----
+        A worker is taken to be straggling if it has been running its current job
+        for longer than ``speculate`` times the average job runtime. All jobs it
+        holds are then candidates for copying, as those queued up behind the
+        current job are held up too. Each job is only ever copied once.
+        """
+        if not self._runtime_count:
+            return
+        threshold = self.speculate * self._runtime_total / self._runtime_count
+        now = time()
+        idle = list(self._idle)
+        # Workers whose current job has overrun, longest running first
+        stragglers = sorted((worker for worker in self.workers if not worker.idle
+                             and now - worker.busy_since > threshold),
+                            key=lambda worker: worker.busy_since)
+        for straggler in stragglers:
+            for frame in straggler.journal.peek(len(straggler.journal)):
+                if not idle:
+                    return
+                # Jobs are only unpacked once they are known to need copying
+                key = _frame_key(frame)
+                if key in self._copies or key in self._leftovers:
+                    continue
+                batch = self._unpack_job(straggler, frame)
+                # Record the copy before sending it, as the send may fail
+                worker = idle.pop()
+                self._copies[key] = {straggler, worker}
+                self._send_job(worker, self._pack_job(worker, batch))
+
+    def _next_speculation(self):
+        """Works out when ``_speculate`` could next copy a job.
+
+        Returns
+        -------
+        when : `float`, `None`
+            Time, as given by ``time.time``, at which the longest running worker
+            holding a job that has not been copied will start straggling. None
+            if no copy could be made, i.e. if there are no idle workers, jobs
+            are still waiting to be sent, or every outstanding job is copied.
+        """
+        if not (self._idle and self._runtime_count) or self._queued_jobs:
+            return None
+        # Number of copied jobs held by each worker, each journaled job is
+        # either one of these or could still be copied.
+        copied = Counter()
+        for holders in chain(self._copies.values(), self._leftovers.values()):
+            copied.update(holders)
+        busy_since = [worker.busy_since for worker in self.workers
+                      if not worker.idle and len(worker.journal) > copied[worker]]
+        if not busy_since:
+            return None
+        return min(busy_since) + self.speculate * self._runtime_total / self._runtime_count
+
+    def _settle_copy(self, worker, key):
+        """Updates the record of copied jobs following the return of a result.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker that returned the result.
+        key : `int`
+            ID of the job, or of the first job in the batch, that was returned.
+
+        Returns
+        -------
+        keep : `bool`
+            False if the result is that of a copy whose twin has already been
+            returned, in which case it should be discarded.
+        """
+        holders = self._leftovers.get(key)
+        if holders is not None:
+            holders.discard(worker)
+            if not holders:
+                del self._leftovers[key]
+            self._redundant[worker] -= 1
+            if not self._redundant[worker]:
+                del self._redundant[worker]
+            return False
+        holders = self._copies.pop(key, None)
+        if holders:
+            # Any other holders are now running leftover copies
+            holders.discard(worker)
+            if holders:
+                self._leftovers[key] = holders
+                for holder in holders:
+                    self._redundant[holder] = self._redundant.get(holder, 0) + 1
+        return True
+
+    def _release_copy(self, lost_worker, job):
+        """Removes a lost worker from the record of copied jobs.
+
+        Parameters
+        ----------
+        lost_worker : `Conjour`
+            The worker that has been lost.
+        job : `list` [`tuple` [`int`, `serialisable`]], `bytes`
+            A job that was held by the lost worker. This will be packed if
+            handshake is False.
+
+        Returns
+        -------
+        requeue : `bool`
+            True if the job must be run again, i.e. it has not been returned and
+            no other worker holds a copy of it.
+        """
+        batch = job if self.handshake else self._unpack_job(lost_worker, job)
+        key = batch[0][0]
+        # Jobs that have already been returned are never run again
+        holders = self._leftovers.get(key)
+        if holders is not None:
+            holders.discard(lost_worker)
+            if not holders:
+                del self._leftovers[key]
+            return False
+        holders = self._copies.get(key)
+        if holders is not None:
+            holders.discard(lost_worker)
+            if holders:
+                return False
+            del self._copies[key]
+        return True
+
+    def _implicate(self, lost_worker, jobs):
+        """Counts the loss of a worker against the jobs that it is suspected of
+        having been running, quarantining any that reach ``max_attempts``.
+
+        Parameters
+        ----------
+        lost_worker : `Conjour`
+            The worker that has been lost.
+        jobs : `list`
+            The batches of jobs held by the worker, in the order in which they
+            were sent. These will be packed if handshake is False.
+
+        Returns
+        -------
+        jobs : `list`
+            The jobs to be re-queued in their place, packed if handshake is False.
+            Batches holding suspects are split up so that only the culprit is
+            quarantined, and so that it can't take the others down with it again.
+
+        Notes
+        -----
+        If the worker announced the jobs that it started then only the last one
+        that it announced is a suspect, provided that its result has not been
+        returned. Otherwise each job in the oldest message that it held is.
+        """
+        started = lost_worker.started
+        announced = lost_worker.announce and lost_worker.peer_announce and started is not None
+        requeue = []
+        for index, job in enumerate(jobs):
+            batch = job if self.handshake else self._unpack_job(lost_worker, job)
+            if announced:
+                suspect = any(job_id == started for job_id, _ in batch)
+            else:
+                suspect = index == 0
+            # Copied jobs are left to their twins
+            if not suspect or batch[0][0] in self._copies or batch[0][0] in self._leftovers:
+                requeue.append(job)
+                continue
+            for job_id, item in batch:
+                if not announced or job_id == started:
+                    attempts = self._attempts[job_id] = self._attempts.get(job_id, 0) + 1
+                    if attempts >= self.max_attempts:
+                        # Move the job to the quarantine, informing ``map`` if it
+                        # was waiting on the result.
+                        del self._attempts[job_id]
+                        self.quarantine[job_id] = item
+                        inbox = self._routes.pop(job_id, None)
+                        if inbox is not None:
+                            inbox[job_id] = _QUARANTINED
+                        continue
+                # Re-pack the job if need be
+                single = [(job_id, item)]
+                requeue.append(single if self.handshake else self._pack_job(lost_worker, single))
+        return requeue
+
+    def _unpack_job(self, worker, frame):
+        """Unpacks a message sent to a worker back into a batch of jobs.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker that the message was packed for.
+        frame : `bytes`, `memoryview`
+            The packed message.
+
+        Returns
+        -------
+        batch : `list` [`tuple` [`int`, `serialisable`]]
+            The batch of (job ID, job) pairs.
+        """
+        job, _, job_id = worker.unpack(frame)
+        return job if job_id is None else [(job_id, job)]
+
+    def _pack_job(self, worker, batch):
+        """Packs a batch of jobs into a message for a worker.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker that is to pack the message.
+        batch : `list` [`tuple` [`int`, `serialisable`]]
+            The batch of (job ID, job) pairs to pack.
+
+        Returns
+        -------
+        packed_job : `list` [`bytes`]
+            The packed message.
+        """
+        return _pack_batch(worker, self.compress, batch)
+
+    def _pool_pack(self, batches):
+        """Packs batches of jobs in parallel using the ``packers`` pool.
+
+        Parameters
+        ----------
+        batches : `iterator` [`list` [`tuple` [`int`, `serialisable`]]]
+            The batches of (job ID, job) pairs to pack.
+
+        Yields
+        ------
+        packed_job : `list` [`bytes`], `bytes`
+            The packed messages, in the same order as ``batches``.
+
+        Notes
+        -----
+        This is only used when handshake is False, as all jobs are then packed
+        in the same way regardless of the worker they are sent to. To keep the
+        pool busy, a few batches are drawn and packed ahead of demand.
+        """
+        # Workers can't be pickled, so pack with an equivalent packer instead
+        packer = Packer(self.workers[0].PROTO, self.workers[0].codecs)
+        # Messages packed in another process must be joined up to be sent back
+        join = isinstance(self.packers, ProcessPoolExecutor)
+        pack = partial(_pack_batch, packer, self.compress, join=join)
+        ahead = 2 * (os.cpu_count() or 1)
+        packing = deque()
+        for batch in batches:
+            packing.append(self.packers.submit(pack, batch))
+            if len(packing) >= ahead:
+                yield packing.popleft().result()
+        while packing:
+            yield packing.popleft().result()
+
+    def retrieve(self, to_page=False, timeout=0):
         """Checks for and returns any pending results received from the workers.
 
         Returns
@@ -283,13 +895,17 @@ class Coordinator:
         to_page : `bool`, optional
             If set to True, then all results are automatically saved to the page
             file and nothing is returned. [DEFAULT=False]
+        timeout : `int`, `float`, `None`, optional
+            Time in seconds to wait for at least one worker to become readable
+            if none are initially. [DEFAULT=0]
 
         Notes
         -----
         Due to the way in which a test for a broken TCP connection must be
         performed (i.e a check for writable data on an empty buffer) it is
         most effective when performed just before a read. Therefore, the test
-        for lost workers is done in this function.
+        for lost workers is done in this function. Workers that have missed
+        their heartbeats are also purged here.
         """
         # Creat a list to hold the results
         results = []
@@ -297,87 +913,632 @@ class Coordinator:
         # If there are any paged results then add them to the results list, but
         # only do this if not saving the results to the page file.
         if self._paged_results and not to_page:
-            results += load_from_page(*self._res_page)
+            results += [pickle.loads(result) for result in self._res_page.pop()]
 
         # Shortcut for results.append to reduce loop overhead
         add_to_results = results.append
 
-        # Loop over the workers
-        for worker in self.workers:
-            # While the worker as data available to read
-            while worker.poll():
-                # Check that the worker is a alive
-                if worker.alive:
-                    # If it is read & append the message to the results list
-                    try:
-                        # Use a timeout of 10 seconds to catch incomplete messages
-                        add_to_results(worker.await_message(timeout=10))
-                    except ConmanIncompleteMessage:
-                        # The presence of an incomplete message indicates that
-                        # the code on the other end crashed during a send
-                        # operation, thus this worker must be purged.
-                        self._purge_lost_worker(worker)
-                        break
-                else:
-                    # If this worker is dead then it must be purged
-                    self._purge_lost_worker(worker)
-                    # Break out of the polling loop
-                    break
+        # Loop over only those workers that have data available to read
+        for worker in self._ready_workers(timeout):
+            # Read all complete messages waiting in the worker's buffer
+            self._drain_worker(worker, add_to_results)
+
+        # Purge any workers that have gone quiet
+        if self.heartbeat is not None:
+            self._check_heartbeats(add_to_results)
+
+        # Give up on lost workers that have not reconnected
+        if self._detached:
+            self._expire_detached()
 
         # If instructed so save the results to a page file
         if to_page:
-            save_to_page(results, *self._res_page)
+            self._page_results(results)
             return None
         # Otherwise return the results
         else:
             return results
 
-    def await_results(self):
+    def await_results(self, timeout=None):
         """This will continue gathering results until all workers are idle. At
         which point the results will be returned.
 
+        Parameters
+        ----------
+        timeout : `int`, `float`, `None`, optional
+            Places an upper bound, in seconds, on the amount of time that this
+            function blocks for. If `None` is specified then this will block
+            until all outstanding jobs have been completed. [DEFAULT=None]
+
         Returns
         -------
         results : `list` [`serialisable`]
             List containing the results from of all outstanding jobs.
+
+        Raises
+        ------
+        ConmanTimeout
+            If the results are not all returned within ``timeout`` seconds. Any
+            results gathered up to that point are kept in the page file and can
+            be retrieved by a later call to ``retrieve`` or ``await_results``.
+
+        Notes
+        -----
+        A "poisoned" job, i.e. one that kills the workers it is sent to (e.g.
+        def x(): exit()), is quarantined once it has taken down ``max_attempts``
+        workers. No result is returned for it, but it may be found in
+        ``quarantine``.
         """
-        # This function is comprised of two loops; 'sub_loop' submits paged
-        # jobs while 'fetch_loop' retries results until all have been returned.
-        # The two operations have been functionalised to make dealing with worker
-        # loss easier. However, it must be noted that this can 1) in result in
-        # a "poisoned" job been passed from one worker to the next killing all
-        # in its path (e.g. def x(): exit()), 2) under some (admittedly unlikely)
-        # conditions result in the recursion limit being breached by
-        # fetch_loop()-sub_loop() calls, and 3) be rather inefficient.
-
-        def fetch_loop():
-            # While worker are active
-            while [s for s in self.workers if not s.idle]:
-                # Fetch any new results, but don't load those in the page, and save
-                # them to the page
-                self.retrieve(to_page=True)
-                sleep(self._await_time)
-            # Check that no more jobs need to be submitted due to worker loss
-            if self._paged_jobs:
-                # If so call back to sub_loop
-                sub_loop()
-
-        def sub_loop():
-            # Continue looping while there are still jobs to run
-            while self._paged_jobs:
-                # Try submitting them (they are loaded within the submit function
-                # so a blank list is passed here)
-                self.submit([])
-                # Wait a few seconds before before trying again
-                sleep(self._await_time)
-            # Once all jobs have been submitted start fetching jobs
-            fetch_loop()
-
-        # Start the process off by submitting any paged jobs.
-        sub_loop()
-
-        # Load all results from the page file and return them
-        return load_from_page(*self._res_page)
+        results = []
+        try:
+            # Gather up the results as they are returned
+            for result in self.as_completed(timeout):
+                results.append(result)
+        except ConmanTimeout:
+            # Page any results that have already been gathered before aborting
+            self._page_results(results)
+            raise
+        # Return the results
+        return results
+
+    def as_completed(self, timeout=None):
+        """Yields results one at a time as they are returned by the workers,
+        until there are no jobs left running or waiting to be run.
+
+        Parameters
+        ----------
+        timeout : `int`, `float`, `None`, optional
+            Places an upper bound, in seconds, on the amount of time that this
+            generator runs for. If `None` is specified then it will continue
+            until all outstanding jobs have been completed. [DEFAULT=None]
+
+        Yields
+        ------
+        result : `serialisable`
+            The result of a completed job.
+
+        Raises
+        ------
+        ConmanTimeout
+            If the results are not all returned within ``timeout`` seconds.
+
+        Notes
+        -----
+        Rather than sleeping between passes this blocks on the shared poll until
+        a worker has something to say. Queued jobs are submitted as soon as a
+        result, or a lost worker, frees up buffer space, and before any of the
+        new results are yielded. Previously paged results are read back from
+        the page file in small batches, and are only removed from it as they
+        are yielded.
+         |
+        Should the generator be abandoned early, any results that have not yet
+        been yielded are returned to the page file.
+        """
+        # Time at which to give up, if a timeout has been given
+        deadline = None if timeout is None else time() + timeout
+
+        # Start the process off by submitting any queued jobs.
+        if self._queued_jobs:
+            self._dispatch()
+
+        # Continue until there are no jobs or results outstanding
+        while self.active:
+            # Yield any paged results lazily, one at a time, off disk
+            if self._paged_results:
+                yield from self._res_page.iter_entries(unpickle=True)
+                continue
+
+            # Wait for the workers to return some results
+            results = self._collect(deadline)
+
+            try:
+                while results:
+                    yield results.popleft()
+            finally:
+                # Page anything that was not yielded if the generator is closed
+                self._page_results(results)
+
+    def map(self, iterable, ordered=True, chunksize=None, buffer_size=None, timeout=None):
+        """Farms out jobs drawn from an iterable and yields their results.
+
+        Parameters
+        ----------
+        iterable : `iterable` [`serialisable`]
+            Jobs to be run. These are drawn from the iterable lazily, only when
+            there is room for them in the reorder buffer.
+        ordered : `bool`, optional
+            If True, results are yielded in the same order as their jobs were
+            drawn from ``iterable``, otherwise they are yielded in the order in
+            which they are returned. [DEFAULT=True]
+        chunksize : `int`, `None`, optional
+            Number of jobs to draw from ``iterable`` and submit at a time. If
+            `None` is given then the number of workers is used. [DEFAULT=None]
+        buffer_size : `int`, `None`, optional
+            Maximum number of jobs that may be outstanding, i.e. submitted but
+            not yet yielded, at any one time. This bounds the size of the reorder
+            buffer. If `None` is given then four times ``chunksize`` is used.
+            [DEFAULT=None]
+        timeout : `int`, `float`, `None`, optional
+            Places an upper bound, in seconds, on the amount of time that this
+            generator runs for. [DEFAULT=None]
+
+        Yields
+        ------
+        result : `serialisable`
+            The result of a job.
+
+        Raises
+        ------
+        ConmanTimeout
+            If the results are not all returned within ``timeout`` seconds.
+        ConmanPoisonedJob
+            If a job is quarantined, upon reaching the point at which its result
+            would have been yielded.
+
+        Notes
+        -----
+        Each job is tagged with an ID which the worker returns along with its
+        result. This is used to route the result back to this generator, and to
+        place it back in input order. Results of other jobs that are returned
+        while this is running are paged as normal. Results of jobs that are
+        still outstanding when the generator is closed are discarded.
+        """
+        # Time at which to give up, if a timeout has been given
+        deadline = None if timeout is None else time() + timeout
+
+        jobs = iter(iterable)
+        chunksize = chunksize or max(self.worker_count, 1)
+        buffer_size = buffer_size or 4 * chunksize
+        # Don't wait on a full chunk's worth of space when the buffer is smaller
+        chunksize = min(chunksize, buffer_size)
+
+        # Results of this call's jobs, keyed by job ID, and the IDs of all
+        # outstanding jobs in input order.
+        inbox = {}
+        pending = deque()
+        exhausted = False
+
+        while True:
+            # Top up the outstanding jobs, one chunk at a time, from the iterable
+            while not exhausted and buffer_size - len(pending) >= chunksize:
+                chunk = [(next(self._job_ids), job) for job in islice(jobs, chunksize)]
+                exhausted = len(chunk) < chunksize
+                # Have the results of these jobs routed to the inbox
+                for job_id, _ in chunk:
+                    self._routes[job_id] = inbox
+                    pending.append(job_id)
+                if chunk:
+                    self._submit(chunk)
+
+            # Stop once all jobs have been run and their results yielded
+            if not pending:
+                return
+
+            # Yield the next result if it is available
+            if ordered and pending[0] in inbox:
+                job_id = pending.popleft()
+                result = inbox.pop(job_id)
+            elif not ordered and inbox:
+                job_id, result = inbox.popitem()
+                pending.remove(job_id)
+            # Otherwise wait for more results, paging any that are not ours
+            else:
+                self._page_results(self._collect(deadline))
+                continue
+            if result is _QUARANTINED:
+                raise ConmanPoisonedJob(f'Job {job_id} was quarantined after killing'
+                                        f' {self.max_attempts} workers')
+            yield result
+
+    def _collect(self, deadline=None):
+        """Blocks until at least one worker becomes readable, collects whatever
+        they return and submits queued jobs if room has been made for them.
+
+        Parameters
+        ----------
+        deadline : `float`, `None`, optional
+            Time, as given by ``time.time``, after which to give up waiting. If
+            `None` is given then this will block indefinitely. [DEFAULT=None]
+
+        Returns
+        -------
+        results : `deque` [`serialisable`]
+            The results returned, excluding those routed to a ``map`` call.
+
+        Raises
+        ------
+        ConmanTimeout
+            If the deadline has already passed.
+        """
+        # Abort if too many workers have been lost
+        self._check_worker_loss()
+
+        # Work out how long the poll may block for
+        wait = None if deadline is None else deadline - time()
+        if wait is not None and wait <= 0:
+            raise ConmanTimeout('Results were not returned within the permitted time')
+        # Wake up in time to copy the next straggler onto an idle worker
+        if self.speculate is not None:
+            when = self._next_speculation()
+            if when is not None:
+                when = max(when - time(), 0)
+                wait = when if wait is None else min(wait, when)
+        # Wake up periodically to look for workers that have gone quiet
+        if self.heartbeat is not None:
+            wait = self.heartbeat if wait is None else min(wait, self.heartbeat)
+        # And in time to give up on lost workers that have not reconnected
+        if self._detached:
+            expiry = min(deadline for _, deadline in self._detached.values()) - time()
+            wait = max(expiry, 0) if wait is None else max(min(wait, expiry), 0)
+
+        # Block until at least one worker becomes ready and collect up anything
+        # that they return. Writable workers are dealt with by the poll.
+        results = deque()
+        ready_workers = self._ready_workers(wait)
+        for worker in ready_workers:
+            self._drain_worker(worker, results.append)
+        if self.heartbeat is not None:
+            self._check_heartbeats(results.append)
+        if self._detached:
+            self._expire_detached()
+
+        # Receiving a result, losing a worker, or sending queued messages, makes
+        # room for queued jobs.
+        if self._queued_jobs:
+            self._dispatch()
+        # Once there are none left, idle workers can be used to copy stragglers
+        elif self.speculate is not None and self._idle:
+            self._speculate()
+
+        return results
+
+    def _page_results(self, results):
+        """Saves results to the results page file.
+
+        Parameters
+        ----------
+        results : `iterable` [`serialisable`]
+            The results to be paged.
+        """
+        self._res_page.extend(pickle.dumps(result) for result in results)
+
+    def _admit(self, worker):
+        """Adds a newly accepted worker, resuming its lost session if it has
+        laid claim to one.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker that has connected.
+        """
+        if worker.peer_claim is None:
+            self._add_worker(worker)
+        else:
+            self._resume(worker)
+
+    def _resume(self, worker):
+        """Hands a reconnected worker the outstanding jobs of its lost session.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The reconnected worker.
+
+        Notes
+        -----
+        Jobs up to and including the one that the worker last received remain
+        with it, and any results that did not get through are sent again by the
+        worker. Jobs sent after that never reached it and so are sent out again.
+        If the session has already been given up on the worker is told that it
+        holds nothing, and it joins as a new worker.
+        """
+        token, received = worker.peer_claim
+        # The lost connection may not have been found to be broken yet
+        for stale in self.workers:
+            if stale.session == token:
+                results = []
+                self._drain_worker(stale, results.append)
+                self._page_results(results)
+                if stale in self.workers:
+                    self._purge_lost_worker(stale)
+                break
+        old, _ = self._detached.pop(token, (None, None))
+        if old is None:
+            worker.grant_claim([])
+            self._add_worker(worker)
+            return
+        # Work out which of the outstanding jobs the worker received
+        keys = [_frame_key(frame) for frame in old.journal.peek(len(old.journal))]
+        held = keys.index(received) + 1 if received in keys else 0
+        worker.grant_claim(keys[:held])
+        frames = worker.adopt(old, held)
+        # Records of copied jobs refer to the worker by its connection
+        for holders in chain(self._copies.values(), self._leftovers.values()):
+            if old in holders:
+                holders.discard(old)
+                holders.add(worker)
+        if old in self._redundant:
+            self._redundant[worker] = self._redundant.pop(old)
+        self._add_worker(worker)
+        self._requeue(old, frames, suspect=False)
+
+    def _expire_detached(self):
+        """Gives up on detached workers that have not reconnected within the
+        grace period, reassigning their jobs.
+        """
+        now = time()
+        for token, (worker, deadline) in list(self._detached.items()):
+            if now >= deadline:
+                del self._detached[token]
+                self._reassign(worker)
+
+    def _accept_workers(self):
+        """Accepts all pending connections without blocking. Their handshakes
+        are begun, and are concluded by ``_greet``.
+        """
+        while True:
+            try:
+                worker = self.soc.accept_connection(conclude=False)
+            except BlockingIOError:
+                return
+            except ConnectionAbortedError:
+                # The connection was dropped before it could be accepted
+                continue
+            except OSError:
+                # A connection that was accepted, but could not be set up, will
+                # have been dropped and logged. Any others, e.g. if out of file
+                # descriptors, are left pending until the socket is next polled.
+                return
+            if self.handshake:
+                self._greeting[worker.fileno()] = worker
+                self._poll.register(worker, select.EPOLLIN)
+            else:
+                self._add_worker(worker)
+
+    def _greet(self, worker):
+        """Concludes the handshake of a newly accepted connection, if the
+        incoming handshake message has arrived, and admits the worker.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            A connection reported as readable by the shared poll.
+        """
+        try:
+            # Readable, but no data, indicates that the connection is dead
+            alive = bool(worker.recv(1, MSG_PEEK | MSG_DONTWAIT))
+            if alive and not worker.conclude_handshake():
+                return
+        except BlockingIOError:
+            return
+        except Exception as error:
+            # Broken, or not a conman, e.g. a malformed handshake message
+            logger.warning('Dropped connection from %s:%d as it could not be set up: %r',
+                           *worker.address, error)
+            alive = False
+        del self._greeting[worker.fileno()]
+        self._poll.unregister(worker)
+        if alive:
+            self._admit(worker)
+        else:
+            worker.kill()
+
+    def retire(self, worker):
+        """Stops sending jobs to a worker and disconnects it once it has
+        returned the results of those that it holds. Unlike a lost worker, this
+        does not count towards ``max_worker_loss``.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker to be retired.
+        """
+        self._retiring.add(worker)
+        self._idle.discard(worker)
+        self._heap_entries.pop(worker, None)
+        self._track(worker)
+
+    def _add_worker(self, worker):
+        """Adds a newly connected worker to the workers list and registers its
+        socket with the shared poll.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker that is to be added.
+        """
+        self.workers.append(worker)
+        self._fd_map[worker.fileno()] = worker
+        self._poll.register(worker, select.EPOLLIN)
+        worker.accounting = self.accounting
+        if self.keepalive is not None:
+            worker.set_keepalive(self.keepalive)
+        self._track(worker)
+
+    def _track(self, worker):
+        """Updates the idle set and free space heap following a change in the
+        state of a worker, i.e. after it has been sent jobs or returned results.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker whose state has changed.
+        """
+        # Retiring workers are disconnected once they have nothing left to do
+        if self._retiring and worker in self._retiring:
+            if worker.idle and not worker.pending_output:
+                self._release(worker)
+            return
+        if worker.idle:
+            self._idle.add(worker)
+        else:
+            self._idle.discard(worker)
+        entry_id = self._heap_entries[worker] = next(self._heap_ids)
+        heappush(self._space_heap, (-worker.free_space, entry_id, worker))
+        # Rebuild the heap if it has become clogged up with stale entries
+        if len(self._space_heap) > 4 * len(self.workers) + 64:
+            self._space_heap = [(-w.free_space, entry_id, w)
+                                for w, entry_id in self._heap_entries.items()]
+            heapify(self._space_heap)
+
+    def _roomiest_worker(self):
+        """Returns the worker with the most free port buffer space.
+
+        Returns
+        -------
+        worker : `Conjour`, `None`
+            The worker with the most free space, or None if there are no workers.
+
+        Notes
+        -----
+        In "kernel" accounting mode the free space recorded in the heap is only
+        a lower bound, as the kernel frees up space as data is sent.
+        """
+        heap = self._space_heap
+        while heap:
+            _, entry_id, worker = heap[0]
+            # Only a worker's most recent entry is valid
+            if self._heap_entries.get(worker) == entry_id:
+                return worker
+            heappop(heap)
+        return None
+
+    def _ready_workers(self, timeout=0):
+        """Identifies which workers have readable data, or have disconnected,
+        via a single call to the shared poll. Any workers reported as writable
+        have their queued messages sent along the way.
+
+        Parameters
+        ----------
+        timeout : `int`, `float`, `None`, optional
+            Time in seconds to wait for a worker to become ready if none are
+            initially. If None then this will block until one is. [DEFAULT=0]
+
+        Returns
+        -------
+        ready_workers : `list` [`Conjour`]
+            Workers with readable data or a broken connection.
+
+        Notes
+        -----
+        New connections are accepted, and their handshakes progressed, along
+        the way.
+        """
+        # epoll uses -1, rather than None, to indicate an indefinite wait
+        timeout = -1 if timeout is None else timeout
+        ready_workers = []
+        for fd, events in self._poll.poll(timeout):
+            worker = self._fd_map.get(fd)
+            if worker is None:
+                # New connections and their handshakes
+                if fd == self.soc.fileno():
+                    self._accept_workers()
+                elif fd in self._greeting:
+                    self._greet(self._greeting[fd])
+                continue
+            # Send what can be sent. Workers found to be broken are handed back
+            # so that they are purged when drained.
+            if events & select.EPOLLOUT and not self._flush_worker(worker):
+                events |= select.EPOLLERR
+            if events & ~select.EPOLLOUT:
+                ready_workers.append(worker)
+        return ready_workers
+
+    def _drain_worker(self, worker, add_to_results):
+        """Reads all pending messages from a worker known to be readable and
+        purges it if it is found to be dead.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker to be read from.
+        add_to_results : `callable`
+            Function to which each received message is passed.
+
+        Notes
+        -----
+        A non-blocking peek is used in place of ``Conman.alive`` as the shared
+        poll has already reported the socket as readable. This allows for the
+        presence of a message and a broken connection to be distinguished with
+        one system call per message. The peek takes in the message header so
+        that command messages, i.e. heartbeats, which are not followed by a
+        result can be read without blocking.
+        """
+        while True:
+            try:
+                # Readable, but no data, indicates that the connection is dead
+                peek = worker.recv(HEADER.size, MSG_PEEK | MSG_DONTWAIT)
+            except BlockingIOError:
+                # No more data to read, the worker's state will have changed
+                self._track(worker)
+                return
+            except OSError:
+                # Reset, or dropped by the kernel as unresponsive
+                peek = b''
+
+            if not peek:
+                # If this worker is dead then it must be purged
+                self._purge_lost_worker(worker)
+                return
+
+            try:
+                # Carry out command messages on their own
+                if len(peek) == HEADER.size and HEADER.unpack(peek)[2]:
+                    worker.read_command()
+                    continue
+                # Use a timeout of 10 seconds to catch incomplete messages
+                result = worker.await_message(timeout=10)
+            except (ConmanIncompleteMessage, OSError):
+                # The presence of an incomplete message indicates that
+                # the code on the other end crashed during a send
+                # operation, thus this worker must be purged.
+                self._purge_lost_worker(worker)
+                return
+
+            # Batches of results come as lists of (job ID, result) pairs
+            results = result if worker.job_id is None else [(worker.job_id, result)]
+            if self.speculate is not None:
+                self._runtime_total += worker.runtime
+                self._runtime_count += 1
+                # Drop the results of copies whose twins have already returned
+                if ((self._copies or self._leftovers)
+                        and not self._settle_copy(worker, results[0][0])):
+                    continue
+            for job_id, result in results:
+                # Jobs that return a result are clearly not poisoned
+                if self._attempts:
+                    self._attempts.pop(job_id, None)
+                if job_id == worker.started:
+                    worker.started = None
+                # Results of jobs submitted by ``map`` are routed to its inbox
+                inbox = self._routes.pop(job_id, None)
+                if inbox is None:
+                    add_to_results(result)
+                else:
+                    inbox[job_id] = result
+
+    def _check_heartbeats(self, add_to_results):
+        """Purges workers that have sent heartbeats, but have not done so for
+        three heartbeat intervals. This is done at most once per interval.
+
+        Parameters
+        ----------
+        add_to_results : `callable`
+            Function to which any results read along the way are passed.
+        """
+        now = time()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.heartbeat
+        limit = now - 3 * self.heartbeat
+        for worker in [worker for worker in self.workers
+                       if worker.last_heard is not None and worker.last_heard < limit]:
+            # Heartbeats may just be waiting to be read, e.g. if the shared poll
+            # did not report all readable workers in one go.
+            if worker.poll():
+                self._drain_worker(worker, add_to_results)
+            if worker in self.workers and worker.last_heard < limit:
+                self._purge_lost_worker(worker)
 
     def _purge_lost_worker(self, lost_worker):
         """Removes lost a lost worker from the workers list, reassigns its jobs
@@ -387,33 +1548,164 @@ class Coordinator:
         ----------
         lost_worker : `Conjour`, `Conman`
             The lost worker to that is to be purged.
+
+        Notes
+        -----
+        If ``grace`` is set the worker is instead detached, holding on to its
+        jobs, in case it reconnects.
         """
-        # Remove the lost_worker from the workers list
-        self.workers.remove(lost_worker)
+        # Remove the lost_worker from the workers list, the idle set and the
+        # shared poll.
+        self._remove_worker(lost_worker)
+        self._retiring.discard(lost_worker)
+        # Give the worker a chance to reconnect before reassigning its jobs
+        if self.grace is not None and lost_worker.session is not None:
+            lost_worker.close()
+            self._detached[lost_worker.session] = (lost_worker, time() + self.grace)
+        else:
+            self._reassign(lost_worker)
+
+    def _remove_worker(self, worker):
+        """Removes a worker from the workers list, the idle set and the shared
+        poll. Its free space heap entries will be discarded lazily.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker to be removed.
+        """
+        self.workers.remove(worker)
+        self._idle.discard(worker)
+        self._writers.discard(worker)
+        self._heap_entries.pop(worker, None)
+        self._poll.unregister(worker)
+        del self._fd_map[worker.fileno()]
+
+    def _release(self, worker):
+        """Disconnects a retired worker that has nothing left to do.
+
+        Parameters
+        ----------
+        worker : `Conjour`
+            The worker to be released.
+        """
+        self._retiring.discard(worker)
+        self._redundant.pop(worker, None)
+        self._remove_worker(worker)
+        try:
+            worker.send_message('CONMAN_KILL', command=True)
+        except OSError:
+            pass
+        worker.kill()
+
+    def _reassign(self, lost_worker):
+        """Reassigns the jobs of a lost worker and shuts it down.
+
+        Parameters
+        ----------
+        lost_worker : `Conjour`
+            The lost worker, which has already been removed from the workers list.
+        """
+        self._redundant.pop(lost_worker, None)
         # Reassign any jobs that were lost with the worker. First read the message
         # from the worker's own page file.
-        jobs = load_from_page(*lost_worker.journal, unpickle=False)
-        # If handshake mode is enabled then the messages will need to be unpacked
-        if self.handshake:
-            jobs = [lost_worker.unpack(job)[0] for job in jobs]
-        # Save the jobs to the page, don't pickle if not needed
-        save_to_page(jobs, *self._job_page, as_pickle=self.handshake)
+        self._requeue(lost_worker, lost_worker.journal.pop())
         # Kill the worker
         lost_worker.kill()
         # Increment the lost worker counter
         self._lost_worker_count += 1
 
-    def disconnect(self,):
+    def _requeue(self, lost_worker, jobs, suspect=True):
+        """Queues up jobs that were held by a lost worker to be sent out again.
+
+        Parameters
+        ----------
+        lost_worker : `Conjour`
+            The worker that the jobs were sent to.
+        jobs : `list` [`memoryview`]
+            The packed jobs, in the order in which they were sent.
+        suspect : `bool`, optional
+            If True, the jobs are held to account for the loss of the worker, see
+            ``_implicate``. [DEFAULT=True]
+        """
+        # If handshake mode is enabled then the messages will need to be unpacked
+        # back into batches of (job ID, job) pairs.
+        if self.handshake:
+            jobs = [self._unpack_job(lost_worker, job) for job in jobs]
+        # The job that the worker was running when it was lost is a suspect
+        if jobs and suspect and self.max_attempts is not None:
+            jobs = self._implicate(lost_worker, jobs)
+        # Copied jobs need not be run again if they have already been returned or
+        # are still held by another worker.
+        if self._copies or self._leftovers:
+            jobs = [job for job in jobs if self._release_copy(lost_worker, job)]
+        # Queue the jobs up ahead of any others. These are held in memory, but
+        # are limited to what could fit into the worker's port buffer.
+        self._sources.appendleft(iter(jobs))
+
+    def _check_worker_loss(self):
+        """Raises an exception if the number of lost workers has passed the
+        tolerated limit, or if all workers have been lost.
+        """
+        # Check if the number of casualties has reached the specified threshold
+        if self._lost_worker_count > self.max_worker_loss:
+            raise ConmanMaxWorkerLoss(
+                'Maximum number of lost workers has been surpassed'
+                f' ({self._lost_worker_count})')
+        # Test if all workers have been lost
+        elif self._lost_worker_count != 0 and len(self.workers) == 0 and not self._detached:
+            # If so raise a ConmanNoWorkersFound error, but only if
+            # no_worker_kill is set to True.
+            if self.no_worker_kill:
+                raise ConmanNoWorkersFound('All workers have been lost')
+
+    def disconnect(self, timeout=0):
         """Ensure the connection is terminated gracefully upon exit.
+
+        Parameters
+        ----------
+        timeout : `float`, `int`, `None`, optional
+            Upper bound, in seconds, on the time to wait for workers to finish
+            running leftover copies of jobs, see ``speculate``. If `None` then
+            this waits for as long as it takes. By default workers are killed
+            straight away, and drop their leftover copies. [DEFAULT=0]
+
+        Notes
+        -----
+        Anything that workers have sent is read before the connections are
+        closed, as closing them with unread data resets them.
         """
+        deadline = None if timeout is None else time() + timeout
+        # Results that come in now are discarded along with the page file
+        results = []
+        while self._redundant:
+            wait = None if deadline is None else deadline - time()
+            if wait is not None and wait <= 0:
+                break
+            # Keep an eye out for hung workers while waiting
+            if self.heartbeat is not None:
+                wait = self.heartbeat if wait is None else min(wait, self.heartbeat)
+            for worker in self._ready_workers(wait):
+                self._drain_worker(worker, results.append)
+            if self.heartbeat is not None:
+                self._check_heartbeats(results.append)
+        for worker in self._ready_workers():
+            self._drain_worker(worker, results.append)
+
         # Loop over the workers and then shut down
         for worker in self.workers:
             # Send kill command
             worker.send_message('CONMAN_KILL', command=True)
             worker.kill()
-        # Close the page files
-        self._job_page[0].close()
-        self._res_page[0].close()
+        # Close the journals of workers that never reconnected, and any
+        # connections that are still mid-handshake.
+        for worker, _ in self._detached.values():
+            worker.journal.close()
+        for worker in self._greeting.values():
+            worker.kill()
+        # Close the shared poll and the page file
+        self._poll.close()
+        self._res_page.close()
 
     def __call__(self, jobs=None, fetch=True):
         """Farms out any supplied jobs and returns the results of any complected
@@ -421,8 +1713,8 @@ class Coordinator:
 
         Parameters
         ----------
-        jobs : `list` [`serialisable`], `None`, optional
-            List of jobs to be submitted.
+        jobs : `iterable` [`serialisable`], `None`, optional
+            Jobs to be submitted, see ``submit``.
         fetch : `bool`, optional
             Specifies if results from past jobs should be returned. [DEFAULT=True]
 
@@ -431,20 +1723,13 @@ class Coordinator:
         results : `list` [`serialisable`]
             Results returned from past jobs; only returned when ``fetch`` is True.
         """
-        # Submit any supplied jobs, if not jobs supplied submit any paged jobs.
-        if jobs is not None or self._paged_jobs:
+        # Submit any supplied jobs, if not jobs supplied submit any queued jobs.
+        if jobs is not None:
             self.submit(jobs)
+        elif self._queued_jobs:
+            self._dispatch()
         # Check if the number of casualties has reached the specified threshold
-        if self._lost_worker_count > self.max_worker_loss:
-            raise ConmanMaxWorkerLoss(
-                'Maximum number of lost workers has been surpassed'
-                f' ({self._lost_worker_count})')
-        # Test if all workers have been lost
-        elif self._lost_worker_count != 0 and len(self.workers) == 0:
-            # If so raise a ConmanNoWorkersFound error, but only if
-            # no_worker_kill is set to True.
-            if self.no_worker_kill:
-                raise ConmanNoWorkersFound('All workers have been lost')
+        self._check_worker_loss()
         # Fetch and return the results of any complected ones if told to
         if fetch:
             return self.retrieve()
@@ -63,5 +63,7 @@ if __name__ == '__main__':
         # Print out the results (post-processing placeholder function)
         print_results(results)
         # When using multiple workers, the order in which results are returned
-        # does not always match the order in which the jobs were sent.
+        # does not always match the order in which the jobs were sent. If order
+        # matters then ``coordinator.map(jobs)`` can be used instead, which will
+        # yield the results in the same order as the jobs.
     # Once the above context closes a Kill signal will be sent to the workers.
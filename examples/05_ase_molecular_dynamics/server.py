@@ -49,8 +49,8 @@ def system_to_smash():
     return system
 
 if __name__ == '__main__':
-    """Sends workers systems to run MD simulations on, concatenates the results
-    and saves them to a file."""
+    """Sends workers systems to run MD simulations on and saves the results to
+    a file as they are returned."""
     from conman.coordinator import Coordinator
     from ase.io import write
     with Coordinator('', 12345, max_worker_loss=0) as coordinator:
@@ -58,11 +58,9 @@ if __name__ == '__main__':
         # Submit a number of jobs equal to double the number of workers
         jobs = [system_to_smash() for _ in range(len(coordinator.workers) * 2)]
         coordinator(jobs, fetch=False)
-        # Wait for the results to come back
-        results = coordinator.await_results()
-    # Flaten the results list into a single trajectory
-    trajectory = [i for j in results for i in j]
-    # Save it to a xyz file
-    write('smashing.xyz', trajectory)
+        # Save each trajectory to a xyz file as soon as it comes back, so that
+        # only one needs to be held in memory at a time.
+        with open('smashing.xyz', 'w') as file:
+            for trajectory in coordinator.as_completed():
+                write(file, trajectory, format='xyz')
     # To view: type "ase gui smashing.xyz" into the console
-
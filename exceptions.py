@@ -27,4 +27,12 @@ class ConmanMaxWorkerLoss(ConmanError):
 
 class ConmanNoWorkersFound(ConmanError):
     """Raised when jobs are submitted but no workers are present."""
-    pass
\ No newline at end of file
+    pass
+
+class ConmanTimeout(ConmanError):
+    """Raised when an operation does not complete within its permitted time."""
+    pass
+
+class ConmanPoisonedJob(ConmanError):
+    """Raised when the result of a job that has been quarantined is requested."""
+    pass
@@ -0,0 +1,36 @@
+import os
+import sys
+from multiprocessing import get_context
+from socket import socket
+
+import pytest
+
+# The repository is itself the ``conman`` package, thus its parent directory
+# must be importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+@pytest.fixture
+def port():
+    """A free port on the loopback interface."""
+    with socket() as soc:
+        soc.bind(('127.0.0.1', 0))
+        return soc.getsockname()[1]
+
+
+@pytest.fixture
+def spawn():
+    """Starts functions in forked processes, which are cleaned up afterwards."""
+    processes = []
+
+    def start(target, *args, **kwargs):
+        process = get_context('fork').Process(target=target, args=args, kwargs=kwargs, daemon=True)
+        process.start()
+        processes.append(process)
+        return process
+
+    yield start
+    for process in processes:
+        process.join(5)
+        if process.is_alive():
+            process.kill()
@@ -0,0 +1,30 @@
+import asyncio
+import os
+
+import pytest
+
+from conman.aio import AsyncCoordinator
+from conman.exceptions import ConmanNoWorkersFound
+from conman.worker import Worker
+
+
+def doomed_worker(port):
+    """Dies upon receiving its first job."""
+    with Worker('127.0.0.1', port) as worker:
+        for _ in worker:
+            os._exit(1)
+
+
+def test_losing_all_workers_raises(port, spawn):
+    """The loss of every worker is reported, rather than leaving the caller
+    waiting on results."""
+    async def main():
+        async with AsyncCoordinator('127.0.0.1', port, max_worker_loss=5) as coordinator:
+            for _ in range(2):
+                spawn(doomed_worker, port)
+            await coordinator.mount(2, timeout=30)
+            await coordinator.submit(range(10))
+            with pytest.raises(ConmanNoWorkersFound):
+                await coordinator.await_results(timeout=30)
+
+    asyncio.run(main())
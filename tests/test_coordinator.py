@@ -0,0 +1,87 @@
+import os
+import time
+from multiprocessing import get_context
+
+import pytest
+
+from conman.coordinator import Coordinator
+from conman.worker import Worker
+
+
+def poisonable_worker(port, **kwargs):
+    """Doubles numbers, and dies upon receiving "poison"."""
+    with Worker('127.0.0.1', port, **kwargs) as worker:
+        for job in worker:
+            if job == 'poison':
+                os._exit(1)
+            worker.reply(job * 2)
+
+
+@pytest.mark.parametrize('max_attempts', [1, 2])
+@pytest.mark.parametrize('batch_size, prefetch', [(4, 0), (1, 4)])
+def test_poison_not_first_is_quarantined(port, spawn, batch_size, prefetch, max_attempts):
+    """Only the poisoned job is quarantined, even if it is not the first job
+    that the lost workers were holding."""
+    coordinator = Coordinator('127.0.0.1', port, max_attempts=max_attempts, max_worker_loss=2,
+                              announce=True)
+    with coordinator:
+        for _ in range(3):
+            spawn(poisonable_worker, port, prefetch=prefetch)
+        coordinator.mount(3, timeout=30)
+
+        jobs = list(range(1, 25))
+        # The second job in the second batch, or the second job of one of the
+        # workers when prefetching.
+        jobs[5] = 'poison'
+        coordinator.submit(jobs, batch_size=batch_size)
+        results = coordinator.await_results(timeout=30)
+
+        assert coordinator.quarantine == {5: 'poison'}
+        assert sorted(results) == sorted(job * 2 for job in jobs if job != 'poison')
+        assert coordinator._lost_worker_count == max_attempts
+
+
+def straggling_worker(port, flag, **kwargs):
+    """Echoes jobs back, taking a while over the first copy of job 0 to be run."""
+    with Worker('127.0.0.1', port, **kwargs) as worker:
+        for job in worker:
+            if job == 0 and not flag.value:
+                flag.value = 1
+                time.sleep(1)
+            worker.reply(job)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'prefetch': 2}, {'heartbeat': 0.05}])
+def test_disconnect_kills_leftover_copies(port, spawn, kwargs):
+    """Workers running leftover copies of jobs are killed straight away, and
+    exit cleanly once they find that the coordinator has hung up."""
+    flag = get_context('fork').Value('i', 0)
+    with Coordinator('127.0.0.1', port, speculate=2) as coordinator:
+        workers = [spawn(straggling_worker, port, flag, **kwargs) for _ in range(3)]
+        coordinator.mount(3, timeout=30)
+        coordinator.submit(range(30))
+        assert sorted(coordinator.await_results(timeout=30)) == list(range(30))
+        assert coordinator._redundant
+        start = time.time()
+    assert time.time() - start < 0.5
+    for worker in workers:
+        worker.join(5)
+        assert worker.exitcode == 0
+
+
+def echo_worker(port):
+    """Echoes jobs back."""
+    with Worker('127.0.0.1', port) as worker:
+        for job in worker:
+            worker.reply(job)
+
+
+def test_submitted_list_can_be_reused(port, spawn):
+    """Clearing a list of jobs once submitted does not lose any of them."""
+    with Coordinator('127.0.0.1', port) as coordinator:
+        spawn(echo_worker, port)
+        coordinator.mount(1, timeout=30)
+        jobs = [bytes(2**20) for _ in range(50)]
+        coordinator.submit(jobs)
+        jobs.clear()
+        assert len(coordinator.await_results(timeout=30)) == 50
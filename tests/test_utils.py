@@ -0,0 +1,29 @@
+from conman.utils import PageFile
+
+
+def test_views_survive_growth_and_compaction():
+    """Entries returned before the file is remapped are not overwritten when
+    the dead space ahead of them is reclaimed."""
+    page_file = PageFile(compact_size=1)
+    page_file.append(b'A' * 10)
+    entry, = page_file.peek(1)
+    # Grow the file so that it is remapped, leaving the entry in the old map
+    page_file.append(b'B' * 10)
+    page_file.peek(2)
+    page_file.skip(2)
+    page_file.append(b'C' * 10)
+    page_file.append(b'D' * 10)
+    assert bytes(entry) == b'A' * 10
+    # Once released the dead space can be reclaimed
+    entry.release()
+    page_file.append(b'E' * 10)
+    assert [bytes(entry) for entry in page_file.pop()] == [b'C' * 10, b'D' * 10, b'E' * 10]
+    page_file.close()
+
+
+def test_empty_entries():
+    """Files holding nothing but empty entries can be read from."""
+    page_file = PageFile()
+    page_file.extend([b'', b''])
+    assert [bytes(entry) for entry in page_file.pop()] == [b'', b'']
+    page_file.close()
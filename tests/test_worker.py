@@ -0,0 +1,34 @@
+import os
+from threading import Thread
+
+from conman.coordinator import Coordinator
+from conman.worker import Worker
+
+
+def crashing_coordinator(port):
+    """Sends out jobs and then crashes."""
+    coordinator = Coordinator('127.0.0.1', port)
+    coordinator.mount(1, timeout=30)
+    coordinator.submit(range(1000))
+    os._exit(0)
+
+
+def test_prefetching_worker_survives_lost_coordinator(port, spawn):
+    """A prefetching worker gives up, rather than hanging, once its superior
+    has been lost."""
+    errors = []
+
+    def run():
+        try:
+            with Worker('127.0.0.1', port, prefetch=2) as worker:
+                for job in worker:
+                    worker.reply(job)
+        except Exception as error:
+            errors.append(error)
+
+    spawn(crashing_coordinator, port)
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(15)
+    assert not thread.is_alive()
+    assert errors
@@ -1,10 +1,98 @@
+import mmap
+import os
 import pickle
+import tempfile
+from array import array
+from bisect import bisect_right
+from random import uniform
+
+
+# Maximum number of buffers that may be passed to a single scatter/gather call
+IOV_MAX = os.sysconf('SC_IOV_MAX') if 'SC_IOV_MAX' in os.sysconf_names else 1024
+
+
+def as_buffers(frame):
+    """Converts a packed message into a list of byte-wise memoryviews suitable
+    for scatter/gather I/O.
+
+    Parameters
+    ----------
+    frame : `list` [`bytes`], `bytes`
+        A packed message, either as a list of buffers or a single buffer.
+
+    Returns
+    -------
+    buffers : `list` [`memoryview`]
+        A memoryview of each non-empty buffer.
+    """
+    if isinstance(frame, (bytes, bytearray, memoryview)):
+        frame = [frame]
+    return [buffer for buffer in (memoryview(i).cast('B') for i in frame) if buffer.nbytes]
+
+
+def advance_buffers(buffers, n):
+    """Drops the first ``n`` bytes from a list of buffers, in place, following a
+    partial write.
+
+    Parameters
+    ----------
+    buffers : `list` [`memoryview`], `deque` [`memoryview`]
+        Byte-wise memoryviews as returned by ``as_buffers``.
+    n : `int`
+        Number of bytes that have been written.
+    """
+    while n:
+        if n >= buffers[0].nbytes:
+            n -= buffers[0].nbytes
+            del buffers[0]
+        else:
+            buffers[0] = buffers[0][n:]
+            n = 0
+
+
+def frame_size(frame):
+    """Returns the size, in bytes, of a packed message.
+
+    Parameters
+    ----------
+    frame : `list` [`bytes`], `bytes`
+        A packed message, either as a list of buffers or a single buffer.
+
+    Returns
+    -------
+    size : `int`
+        The total number of bytes.
+    """
+    return sum(buffer.nbytes for buffer in as_buffers(frame))
+
+
+def backoff(initial=0.01, maximum=0.5):
+    """Yields the delays to wait for between successive retries of an
+    operation, e.g. a connection attempt.
+
+    Parameters
+    ----------
+    initial : `float`, optional
+        Upper bound, in seconds, on the first delay. [DEFAULT=0.01]
+    maximum : `float`, optional
+        Upper bound, in seconds, on any delay. [DEFAULT=0.5]
+
+    Yields
+    ------
+    delay : `float`
+        The time in seconds to wait before the next retry.
+
+    Notes
+    -----
+    The upper bound doubles after each retry, until it reaches ``maximum``. Each
+    delay is drawn at random from the upper half of the bound, so that a large
+    number of clients that fail together don't all retry together.
+    """
+    bound = initial
+    while True:
+        yield uniform(bound / 2, bound)
+        bound = min(2 * bound, maximum)
 
-"""
-TODO:
-    - Read the whole page file at once and then split up after the fact
-        to speed up the function.
-"""
 
 def save_to_page(entries, page, journal, as_pickle=True):
     """Saves data to a temporary page file. Primarily used to 1) stash
@@ -68,3 +156,267 @@ def load_from_page(page, journal, unpickle=True):
     page.seek(0)
     # Return the results
     return results
+
+
+class PageFile:
+    """An append-only page file from which entries can be removed from the front
+    in constant time. Rather than rewriting the file each time an entry is
+    removed, the offset of the first live entry is tracked and the dead space
+    ahead of it is only reclaimed occasionally.
+
+    Parameters
+    ----------
+    compact_size : `int`, optional
+        Amount of dead space, in bytes, that must accumulate at the front of the
+        file before it is compacted. [DEFAULT=2**20]
+    read_size : `int`, optional
+        Number of bytes to aim for when reading entries in batches, see
+        ``iter_entries``. [DEFAULT=2**20]
+
+    Properties
+    ----------
+    file : `TemporaryFile`
+        The underlying temporary file.
+    offsets : `array` [`int`]
+        Offset at which each entry starts, followed by the offset at which the
+        next entry will be written. Entries ahead of ``_first`` are dead.
+    _first : `int`
+        Index of the first live entry.
+    _map : `mmap.mmap`, `None`
+        Read only memory map of the file, through which entries are read.
+    _retired : `list` [`mmap.mmap`]
+        Maps replaced by ``_map`` as the file has grown, that are kept until
+        the entries returned from them have been released.
+
+    Notes
+    -----
+    Compaction is deferred until the dead space also exceeds the amount of live
+    data, thus its cost is amortised over the removals that preceded it. A file
+    that is emptied is simply truncated.
+     |
+    Entries are returned as memoryviews of the memory mapped file, so reading
+    them involves no copying, and they may be passed straight to
+    ``pickle.loads`` or a socket. Dead space is only reclaimed once all views
+    into the file have been released, thus entries remain valid for as long
+    as they are in use.
+    """
+    def __init__(self, compact_size=2**20, read_size=2**20):
+        self.file = tempfile.TemporaryFile(buffering=0)
+        self.offsets = array('Q', [0])
+        self.compact_size = compact_size
+        self.read_size = read_size
+        self._first = 0
+        self._map = None
+        self._retired = []
+
+    def __len__(self):
+        """Returns the number of live entries in the page file.
+        """
+        return len(self.offsets) - self._first - 1
+
+    @property
+    def _head(self):
+        """Offset of the first live entry.
+        """
+        return self.offsets[self._first]
+
+    @property
+    def _tail(self):
+        """Offset at which the next entry will be written.
+        """
+        return self.offsets[-1]
+
+    def append(self, entry):
+        """Appends an entry to the end of the page file.
+
+        Parameters
+        ----------
+        entry : `bytes`, `list` [`bytes`]
+            The data to be written. This may be given as a list of buffers, e.g.
+            a packed message, which will be written as a single entry without
+            first being joined together.
+        """
+        self.extend([entry])
+
+    def extend(self, entries):
+        """Appends multiple entries to the end of the page file, writing them all
+        at once.
+
+        Parameters
+        ----------
+        entries : `iterable` [`bytes`, `list` [`bytes`]]
+            The entries to be written, see ``append``.
+        """
+        self._reclaim()
+        buffers = []
+        offset = self._tail
+        for entry in entries:
+            entry = as_buffers(entry)
+            buffers += entry
+            self.offsets.append(self.offsets[-1] + sum(buffer.nbytes for buffer in entry))
+        while buffers:
+            written = os.pwritev(self.file.fileno(), buffers[:IOV_MAX], offset)
+            offset += written
+            advance_buffers(buffers, written)
+
+    def popleft(self):
+        """Removes and returns the first entry in the page file.
+
+        Returns
+        -------
+        entry : `memoryview`
+            The first entry.
+        """
+        return self.pop(1)[0]
+
+    def skip(self, k=1):
+        """Removes entries from the front of the page file without reading them.
+
+        Parameters
+        ----------
+        k : `int`, optional
+            Number of entries to remove. [DEFAULT=1]
+        """
+        if k > len(self):
+            raise IndexError('Cannot skip more entries than are in the page file')
+        # Only the index of the first live entry is moved, the file itself is
+        # left as is until the next write.
+        self._first += k
+
+    def pop(self, k=None):
+        """Removes and returns entries from the front of the page file, leaving
+        any others in place.
+
+        Parameters
+        ----------
+        k : `int`, `None`, optional
+            Maximum number of entries to remove. If `None` then all entries are
+            removed. [DEFAULT=None]
+
+        Returns
+        -------
+        entries : `list` [`memoryview`]
+            The entries in the order they were written.
+        """
+        k = len(self) if k is None else min(k, len(self))
+        entries = self.peek(k)
+        self.skip(k)
+        return entries
+
+    def peek(self, k):
+        """Returns entries from the front of the page file without removing them.
+
+        Parameters
+        ----------
+        k : `int`
+            Number of entries to read.
+
+        Returns
+        -------
+        entries : `list` [`memoryview`]
+            The first ``k`` entries.
+        """
+        if not k:
+            return []
+        # Empty files can't be mapped, this only happens if all entries are empty
+        if not self._tail:
+            return [memoryview(b'') for _ in range(k)]
+        # Map in any data written since the file was last mapped. The old map is
+        # kept track of until any views taken of it have been released.
+        if self._map is None or len(self._map) < self._tail:
+            if self._map is not None:
+                self._retired.append(self._map)
+            self._map = mmap.mmap(self.file.fileno(), self._tail, access=mmap.ACCESS_READ)
+        data = memoryview(self._map)
+        offsets = self.offsets[self._first:self._first + k + 1]
+        return [data[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def iter_entries(self, unpickle=False):
+        """Removes and yields entries from the front of the page file one at a
+        time. Entries are read in batches of roughly ``read_size`` bytes.
+
+        Parameters
+        ----------
+        unpickle : `bool`, optional
+            Indicates if the entries should be unpickled. [DEFAULT=False]
+
+        Yields
+        ------
+        entry : `memoryview`, `Any`
+            The next entry.
+
+        Notes
+        -----
+        Each entry is only removed once it is yielded, thus if iteration stops
+        early the remaining entries are left in the page file. Entries appended
+        during iteration will also be yielded.
+        """
+        while len(self):
+            # Work out how many entries make up the next batch, always at least one
+            end = bisect_right(self.offsets, self._head + self.read_size, self._first + 1)
+            for entry in self.peek(max(end - self._first - 1, 1)):
+                self.skip()
+                yield pickle.loads(entry) if unpickle else entry
+
+    def clear(self):
+        """Removes all entries from the page file.
+        """
+        self._first = len(self.offsets) - 1
+        self._reclaim()
+
+    def close(self):
+        """Closes the underlying file.
+        """
+        self._release_map()
+        self.file.close()
+
+    def _release_map(self):
+        """Closes the memory maps, unless views of them are still in use.
+
+        Returns
+        -------
+        released : `bool`
+            True if all maps were closed, or none existed.
+        """
+        maps = self._retired if self._map is None else self._retired + [self._map]
+        self._map, self._retired = None, []
+        for old_map in maps:
+            try:
+                old_map.close()
+            except BufferError:
+                # Entries that have been returned are still in use. Leave the
+                # map to be closed once they have been released.
+                self._retired.append(old_map)
+        return not self._retired
+
+    def _reclaim(self):
+        """Reclaims the dead space at the front of the file, if enough of it has
+        built up and none of it is still in use.
+        """
+        head, live = self._head, self._tail - self._head
+        if not head or (live and (head <= self.compact_size or head <= live)):
+            return
+        # Data can't be moved, nor the file truncated, while it is still mapped
+        if not self._release_map():
+            return
+        if live:
+            self._compact()
+        else:
+            self.file.truncate(0)
+            self.offsets = array('Q', [0])
+            self._first = 0
+
+    def _compact(self):
+        """Moves the live entries to the start of the file and truncates it.
+        """
+        fd = self.file.fileno()
+        head, live = self._head, self._tail - self._head
+        # Copy in chunks to avoid reading all live data into memory at once. As
+        # data only ever moves towards the start of the file it is safe to do so
+        # in place.
+        for offset in range(0, live, self.compact_size):
+            chunk = os.pread(fd, min(self.compact_size, live - offset), head + offset)
+            os.pwrite(fd, chunk, offset)
+        self.file.truncate(live)
+        self.offsets = array('Q', (offset - head for offset in self.offsets[self._first:]))
+        self._first = 0
@@ -1,6 +1,12 @@
-from conman.exceptions import ConmanKillSig
+from collections import deque
+from queue import Empty, Full, Queue
+from socket import IPPROTO_TCP, TCP_NODELAY
+from threading import Event, RLock, Thread
+
+from conman.exceptions import ConmanKillSig, ConmanIncompleteMessage
 
 from conman.conman import Conman
+from conman.utils import frame_size
 from time import time
 
 """
@@ -34,17 +40,84 @@ class Worker:
         ``timeout``:
             Time in seconds to keep attempting to connect with the superior before
             raising an error (`float`, `int`).
+        ``compress``:
+            Compression policy used to decide whether results should be compressed
+            before they are sent back (`CompressionPolicy`, `bool`). If True then
+            the default policy is used. [DEFAULT=False]
+        ``prefetch``:
+            Number of messages to receive and unpack ahead of time (`int`). If
+            non-zero, a background thread will receive upcoming jobs while the
+            current one is being worked on and another will send results back,
+            so that the user's code need not wait on the socket. [DEFAULT=0]
+        ``heartbeat``:
+            Interval in seconds at which to send heartbeats to the superior
+            (`float`, `None`). These are sent by a background thread, so that
+            the superior can tell a worker that is busy from one that has been
+            lost, see ``Coordinator``. If None then no heartbeats are sent.
+            [DEFAULT=None]
+        ``keepalive``:
+            Time in seconds after which the superior is deemed to have been
+            lost if it has become unreachable (`float`, `None`), see
+            ``Conman.set_keepalive``. If None then the system defaults are used.
+            [DEFAULT=None]
+        ``grace``:
+            Time in seconds to spend trying to reconnect to the superior should
+            the connection be lost (`float`, `None`). Upon reconnecting the worker
+            resumes its session, sending back any results that did not get
+            through, provided that the superior has not yet given up on it, see
+            ``Coordinator``. This requires handshake to be True and can't be
+            used when prefetching. If None then the error that caused the loss
+            is raised. [DEFAULT=None]
 
     """
     def __init__(self, host, port, handshake=True, **kwargs):
         self.soc = Conman((host, port), handshake=handshake)
+        # Offer to announce each job as it is started, see ``_announce``
+        self.soc.announce = True
 
         self.timeout = kwargs.get('timeout', 60)
+        self.compress = kwargs.get('compress', False)
+        self.prefetch = kwargs.get('prefetch', 0)
+        self.heartbeat = kwargs.get('heartbeat', None)
+        self.keepalive = kwargs.get('keepalive', None)
+        self.grace = kwargs.get('grace', None)
         self.handshake = handshake
+        if self.grace is not None and (self.prefetch or not handshake):
+            raise ValueError('"grace" requires handshake to be True and prefetch to be 0')
 
         # Allows for one call to __call__ to be made without an argument
         self.__free_pass = True
 
+        # Jobs that have been received but not yet handed out, the ID of the
+        # job currently being worked on, and the results gathered so far for
+        # the current batch.
+        self._jobs = deque()
+        self._job_id = None
+        self._batch = None
+
+        # Queues used to pass messages to and from the background I/O threads
+        # when prefetching, along with any error raised by the sending thread.
+        self._inbox = Queue(maxsize=self.prefetch)
+        self._outbox = Queue(maxsize=self.prefetch)
+        self._sender = None
+        self._send_error = None
+
+        # Set if the superior sent a kill signal before hanging up on a result
+        self._kill_pending = False
+
+        # Prevents heartbeats from being interleaved with other messages, and
+        # is used to stop the heartbeat thread.
+        self._send_lock = RLock()
+        self._stopped = Event()
+
+        # The session token, the ID of the last job received, or of the first
+        # job in the batch, and the results that may not have got through along
+        # with the number of bytes sent up to the end of each. These are used to
+        # resume the session should the connection be lost.
+        self._session = None
+        self._received = None
+        self._unacked = deque()
+        self._sent = 0
 
     def connect(self):
         """Connect the worker to its superior.
@@ -58,10 +131,40 @@ class Worker:
         # Attempt to establish a connection to the coordinator, try for at least
         # ``timeout`` seconds before giving up.
         self.soc.make_connection(self.timeout)
+        self._configure()
+
+        # Start sending heartbeats
+        if self.heartbeat is not None:
+            Thread(target=self._heartbeat_loop, daemon=True).start()
+
+        # Start up the background I/O threads if prefetching
+        if self.prefetch:
+            Thread(target=self._receive_loop, daemon=True).start()
+            self._sender = Thread(target=self._send_loop, daemon=True)
+            self._sender.start()
+
+    def _configure(self):
+        """Sets up a newly made connection to the superior, and records the
+        session that it has been issued.
+        """
+        if self.keepalive is not None:
+            self.soc.set_keepalive(self.keepalive)
+        # Announcements must not be held back by Nagle's algorithm, as they are
+        # of most use when the worker is about to be lost.
+        if self.soc.peer_announce:
+            self.soc.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+        self._session = self.soc.peer_session
 
     def disconnect(self):
         """Ensure the connection is terminated gracefully upon exit.
         """
+        # Allow the sending thread to finish sending any outstanding results,
+        # unless it has already died.
+        if self._sender is not None and self._put_outbox(None):
+            self._sender.join()
+        # Stop sending heartbeats, waiting on any that is being sent
+        with self._send_lock:
+            self._stopped.set()
         # Kill the connection
         self.soc.kill()
 
@@ -110,7 +213,9 @@ class Worker:
         Notes
         -----
         A worker can only be in possession of one job at a time and cannot receive
-        another until the results of the last one have been sent back.
+        another until the results of the last one have been sent back. Jobs that
+        are sent as a batch are handed out one at a time, with their results
+        being sent back together once the batch is complete.
          |
         As a job can take the form of any picklable entity, it is up to the
         user to interpret what must be done and what should be sent back as
@@ -128,10 +233,321 @@ class Worker:
                 # expect it to be.
                 raise Exception('"None" must be supplied to the first function call')
             # Fetch and return a result
-            return self.soc.await_message()
+            return self._next_job()
 
         # If this is a standard call:
         # Send the result form the last job
-        self.soc.send_message(result)
+        self.reply(result)
         # Retrieve and return a new job
-        return self.soc.await_message()
+        return self._next_job()
+
+    def __iter__(self):
+        """Iterates over the jobs sent by the superior, handing them out one at
+        a time. The result of each job must be sent back via ``reply`` before
+        the next job is requested.
+
+        Yields
+        ------
+        job : `Any`
+            A message from a superior detailing a job to be carried out.
+
+        Notes
+        -----
+        Iteration ends when the superior sends a kill signal.
+        """
+        # Block free passes as the first job is handed out here
+        self.__free_pass = False
+        try:
+            while True:
+                yield self._next_job()
+        except ConmanKillSig:
+            return
+
+    def reply(self, result):
+        """Sends the result of the current job back to the superior.
+
+        Parameters
+        ----------
+        result : `serialisable`
+            Result of the job that was last handed out.
+
+        Notes
+        -----
+        If the job arrived as part of a batch then its result is held back until
+        all jobs in the batch are done, at which point all of their results are
+        sent back together as a single batch.
+        """
+        if self._batch is None:
+            # Send the result, tagged with its job's ID
+            self._send(result, job_id=self._job_id, compress=self.compress)
+        else:
+            self._batch.append((self._job_id, result))
+            # Once the batch has been completed, send all of its results back
+            if not self._jobs:
+                self._send(self._batch, batch=True, compress=self.compress)
+                self._batch = None
+
+    def _next_job(self):
+        """Returns the next job, waiting for one to arrive if necessary.
+
+        Returns
+        -------
+        job : `Any`
+            A message from a superior detailing a job to be carried out.
+        """
+        # Fetch a new message once all jobs from the last one have been handed out
+        if not self._jobs:
+            job_id, message = self._receive()
+            # Batches hold a list of (job ID, job) pairs
+            if job_id is None:
+                self._jobs.extend(message)
+                self._batch = []
+            else:
+                self._jobs.append((job_id, message))
+        self._job_id, job = self._jobs.popleft()
+        if self.soc.peer_announce:
+            self._announce()
+        return job
+
+    def _announce(self):
+        """Tells the superior that the current job is about to be started, so
+        that it alone is held to account should the worker be lost while running
+        it. This is only done if the superior asked for it during the handshake.
+
+        Notes
+        -----
+        The announcement is sent directly, even when prefetching, so that it is
+        not held up behind results waiting to be sent.
+        """
+        try:
+            with self._send_lock:
+                self.soc.send_message('CONMAN_START', command=True, job_id=self._job_id)
+        except OSError:
+            # The loss of the connection is dealt with once the result is sent
+            pass
+
+    def _receive(self):
+        """Gets the next message from the superior, either directly from the
+        socket or from the prefetched messages.
+
+        Returns
+        -------
+        job_id : `int`, `None`
+            ID of the job, or None if the message is a batch.
+        message : `Any`
+            The message received.
+        """
+        if self._kill_pending:
+            raise ConmanKillSig('A kill signal was received')
+        if not self.prefetch:
+            while True:
+                try:
+                    message = self.soc.await_message()
+                    break
+                except (ConmanIncompleteMessage, OSError):
+                    if self.grace is None:
+                        raise
+                    self._reconnect()
+            job_id = self.soc.job_id
+            # Batches are identified by the ID of their first job
+            self._received = message[0][0] if job_id is None else job_id
+            return job_id, message
+        job_id, message, error = self._inbox.get()
+        # Errors, such as a kill signal, are passed on from the receiving thread
+        if error is not None:
+            raise error
+        return job_id, message
+
+    def _send(self, message, **kwargs):
+        """Sends a message to the superior, either directly or by passing it to
+        the sending thread.
+
+        Parameters
+        ----------
+        message : `serialisable`
+            The message to be sent.
+        **kwargs
+            Keyword arguments for ``Conman.send_message``.
+        """
+        if not self.prefetch:
+            with self._send_lock:
+                if self.grace is not None:
+                    self._send_resumable(message, **kwargs)
+                    return
+                try:
+                    self.soc.send_message(message, **kwargs)
+                except OSError:
+                    if not self._was_killed():
+                        raise
+            return
+        if not self._put_outbox((message, kwargs)):
+            if not (isinstance(self._send_error, OSError) and self._was_killed()):
+                raise self._send_error
+
+    def _was_killed(self):
+        """Checks if the superior sent a kill signal before the connection was
+        broken. If so then the superior has simply hung up without waiting for
+        the result, and the kill signal is raised when the next job is requested.
+
+        Returns
+        -------
+        killed : `bool`
+            True if a kill signal was found among the messages yet to be read.
+        """
+        if self.prefetch:
+            # The receiving thread passes on whatever arrived, ending with the
+            # kill signal or the error caused by the broken connection.
+            error = None
+            try:
+                while error is None:
+                    _, _, error = self._inbox.get(timeout=1)
+            except Empty:
+                return False
+            self._kill_pending = isinstance(error, ConmanKillSig)
+            return self._kill_pending
+        try:
+            self.soc.setblocking(False)
+            while True:
+                self.soc.await_message()
+        except ConmanKillSig:
+            self._kill_pending = True
+            return True
+        except (ConmanIncompleteMessage, OSError):
+            return False
+
+    def _put_outbox(self, item):
+        """Places an item in the outbox, waiting for room if need be, but only
+        for as long as the sending thread is alive to make room.
+
+        Parameters
+        ----------
+        item : `tuple`, `None`
+            The item to be sent, see ``_send_loop``.
+
+        Returns
+        -------
+        placed : `bool`
+            False if the sending thread has died, e.g. upon losing the connection.
+        """
+        while self._send_error is None and self._sender.is_alive():
+            try:
+                self._outbox.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _receive_loop(self):
+        """Receives and unpacks messages in the background, placing them in the
+        inbox. This blocks once ``prefetch`` messages are waiting to be handed out.
+        """
+        try:
+            while True:
+                message = self.soc.await_message()
+                self._inbox.put((self.soc.job_id, message, None))
+        except Exception as error:
+            # Pass the error, e.g. a kill signal, on to the main thread
+            self._inbox.put((None, None, error))
+
+    def _send_loop(self):
+        """Packs and sends the messages placed in the outbox in the background.
+        """
+        while True:
+            item = self._outbox.get()
+            # None is used to signal that the worker is disconnecting
+            if item is None:
+                return
+            message, kwargs = item
+            try:
+                with self._send_lock:
+                    self.soc.send_message(message, **kwargs)
+            except Exception as error:
+                # Record the error so that it can be raised in the main thread
+                self._send_error = error
+                return
+
+    def _heartbeat_loop(self):
+        """Sends a heartbeat to the superior every ``heartbeat`` seconds until
+        the worker disconnects.
+        """
+        while not self._stopped.wait(self.heartbeat):
+            try:
+                with self._send_lock:
+                    # The connection may have been killed while waiting on the lock
+                    if self._stopped.is_set():
+                        return
+                    self.soc.send_message('CONMAN_HEARTBEAT', command=True)
+            except OSError:
+                # The connection has been lost, which the main thread will find
+                # and may yet recover from.
+                continue
+
+    def _send_resumable(self, message, **kwargs):
+        """Sends a result to the superior, holding on to it until it is known
+        to have got through, and reconnects if the connection has been lost.
+
+        Parameters
+        ----------
+        message : `serialisable`
+            The result to be sent.
+        **kwargs
+            Keyword arguments for ``Conman.pack``.
+
+        Notes
+        -----
+        A result is known to have got through once the superior's end of the
+        connection has acknowledged it, i.e. once it has left the send queue.
+        """
+        frame = self.soc.pack(message, **kwargs)
+        key = message[0][0] if kwargs.get('batch', False) else kwargs['job_id']
+        self._sent += frame_size(frame)
+        self._unacked.append((self._sent, key, frame))
+        try:
+            self.soc.send_message(frame, packed=True)
+        except OSError:
+            # Don't reconnect if the superior has hung up
+            if self._was_killed():
+                return
+            # The result will be sent again once reconnected
+            self._reconnect()
+            return
+        # Forget about the results that have been acknowledged
+        acked = self._sent - self.soc.send_queue_size
+        while self._unacked and self._unacked[0][0] <= acked:
+            self._unacked.popleft()
+
+    def _reconnect(self):
+        """Reconnects to the superior and resumes the lost session, trying for
+        up to ``grace`` seconds.
+
+        Notes
+        -----
+        The superior answers the worker's claim to its lost session with the
+        jobs that it still considers to be outstanding. The results of those
+        that did not get through are sent again, the rest are dropped. As jobs
+        are only received once the last has been finished, the worker holds no
+        unfinished jobs at this point.
+        """
+        deadline = time() + self.grace
+        with self._send_lock:
+            while True:
+                self.soc.kill()
+                self.soc = Conman(self.soc.address, handshake=True)
+                self.soc.announce = True
+                self.soc.claim = (self._session, self._received)
+                try:
+                    self.soc.make_connection(max(deadline - time(), 0))
+                    self._configure()
+                    held = set(self.soc.await_message())
+                    # Only results that are still outstanding are sent again
+                    unacked, self._unacked, self._sent = self._unacked, deque(), 0
+                    for _, key, frame in unacked:
+                        if key in held:
+                            self._sent += frame_size(frame)
+                            self._unacked.append((self._sent, key, frame))
+                    for _, _, frame in self._unacked:
+                        self.soc.send_message(frame, packed=True)
+                    return
+                except (ConmanIncompleteMessage, OSError):
+                    if time() >= deadline:
+                        raise